@@ -4,20 +4,52 @@ from bs4 import BeautifulSoup
 import pandas as pd
 import nest_asyncio
 from asyncio import Semaphore
-from pg_scraper_utils.Event_utils import process_event, get_showcase_info, scrape_data
+from pg_scraper_utils.Event_utils import process_event, get_showcase_info, scrape_data, stream_events
+from pg_scraper_utils.Output_utils import open_sink, Checkpoint, write_stream, checkpoint_name
+from pg_scraper_utils.Parser_utils import shared_parse_pool
+from pg_scraper_utils.Throttle_utils import AdaptiveLimiter
+from pg_scraper_utils.Cache_utils import ResponseCache
+from pg_scraper_utils.Client_utils import shared_client
+from pg_scraper_utils.Probe_utils import IdIndex, probe_live_ranges, event_exists, with_samples
+from pg_scraper_utils.Normalize_utils import normalize_events
+from pg_scraper_utils.Metrics_utils import ScrapeMetrics, configure_logging
+from pg_scraper_utils.Player_utils import process_player, player_frame
+from pg_scraper_utils.Output_utils import table_formats
+from itertools import chain
 
 
 
-async def run_event_scraper(start_id: int = 1, end_id: int = 90000, threads: int = 50, retries: int = 5, csv_filename: str = 'Perfect_Game_Workout_Sheet.csv') -> None:
+async def run_event_scraper(start_id: int = 1, end_id: int = 90000, threads: int = 50, retries: int = 5, csv_filename: str = 'Perfect_Game_Workout_Sheet.csv', client: httpx.AsyncClient = None,
+                            batch_size: int = 500, checkpoint_filename: str = None, resume: bool = True, output_format: str = 'csv',
+                            parse_workers: int = 0, requests_per_second: float = None, limiter: AdaptiveLimiter = None,
+                            cache: ResponseCache = None, id_index: IdIndex = None, probe_block_size: int = 1000, metrics: ScrapeMetrics = None) -> None:
     '''
-    Function accesses showcase data available on Perfect Game through a specified range of Event IDs. Async and Semaphore additions used to hasten process
-    while waiting on site requests. Semaphores should be used in moderation as to not overwhelm with site requests.
+    Function accesses showcase data available on Perfect Game through a specified range of Event IDs. IDs are fed lazily to a bounded pool of async
+    fetches to hasten process while waiting on site requests. Threads should be used in moderation as to not overwhelm with site requests.
+    Events are appended to the CSV in batches as they finish and recorded in a checkpoint file, so a rerun over the same range resumes the sweep.
     
     Args:
         start_id: the first PG Event ID in the range of events being scraped
         end_id:  the last PG Event ID in the range of events being scraped
-        threads: amount of semaphores available for use
+        threads: maximum amount of events fetched at once
         csv_filename: specified name of csv file where event data is being saved
+        client: shared httpx client (see Client_utils.create_client) reused for every event. One sized to threads is created if not given.
+        batch_size: amount of finished events collected between writes to the CSV
+        checkpoint_filename: file tracking completed and failed event IDs. Defaults to csv_filename + '.checkpoint' ('.events.checkpoint' with table formats).
+        resume: skips event IDs already completed in the checkpoint and appends to the CSV. False starts the sweep over.
+        output_format: 'csv', 'parquet' (typed columns, csv_filename is then a dataset directory) or 'sqlite' (rows are upserted into
+            the events table of the csv_filename database, keyed by EventID and row). See Output_utils.sink_formats.
+        parse_workers: processes used to parse pages off the event loop (see Parser_utils.ParsePool). 0 parses inline, None uses every core.
+        requests_per_second: cap on the request rate. None leaves the rate uncapped.
+        limiter: shared concurrency/rate controller, ex. to share one budget with a player sweep. One ramping up to `threads`
+            concurrent requests (backing off on 429/5xx) is created if not given.
+        cache: on-disk response cache, ex. ResponseCache('pg_cache'). Pages of events that ended over 30 days ago are kept
+            as immutable and never re-downloaded, other pages are served within the cache ttl and revalidated after it.
+        id_index: known event IDs, ex. IdIndex('pg_ids.sqlite', 'event'). When given, the range is probed first (see
+            Probe_utils.probe_live_ranges) and only blocks with events are swept. Every ID checked is recorded.
+        probe_block_size: IDs per probed block, dead blocks of this size are skipped
+        metrics: run metrics (see Metrics_utils.ScrapeMetrics), ex. to export them for Prometheus. One logging a progress
+            summary every 30 seconds is created if not given. Per-event messages are logged at DEBUG.
 
     Returns:
         None: A saved CSV containing info on all events specified. 
@@ -27,9 +59,25 @@ async def run_event_scraper(start_id: int = 1, end_id: int = 90000, threads: int
         Exception: Program quits when error occurs.
     
     '''
+    checkpoint = Checkpoint(checkpoint_filename or checkpoint_name(csv_filename, output_format, 'events'), reset=not resume)
+    sink = open_sink(csv_filename, output_format, append=len(checkpoint) > 0, table='events')
+    metrics = metrics or ScrapeMetrics('events', total=max(0, end_id - start_id - len(checkpoint)), log_every=30)
+
     try:
-        event_ids = range(start_id, end_id) 
-        all_tables = await scrape_data(event_ids, retries, threads)
+        limiter = limiter or AdaptiveLimiter(maximum=threads, rate=requests_per_second)
+        async with shared_client(client, max_connections=threads, max_keepalive_connections=threads) as client, shared_parse_pool(workers=parse_workers) as parse_pool:
+            event_ids, sampled = range(start_id, end_id), {}
+            if id_index is not None: #samples the range first so dead stretches of IDs are never swept
+                fetch = lambda event_id: process_event(event_id, retries, client=client, parse_pool=parse_pool, limiter=limiter, cache=cache, metrics=metrics)
+                ranges, sampled = await probe_live_ranges(fetch, start_id, end_id, id_index, event_exists, probe_block_size, threads=threads)
+                event_ids = (event_id for event_id in chain.from_iterable(ranges) if event_id not in sampled)
+
+            results = stream_events(checkpoint.pending(event_ids), retries, threads, client, parse_pool, limiter, cache, metrics)
+            if sampled: #events fetched by the probe go straight to the output
+                results = with_samples({event_id: result for event_id, result in sampled.items() if not checkpoint.is_complete(event_id)}, results)
+            if id_index is not None:
+                results = id_index.track(results, event_exists)
+            await write_stream(results, sink, checkpoint, batch_size, prepare=normalize_events, metrics=metrics)
 
     except KeyboardInterrupt:
         print(f'Keyboard Interrupt caught - shutting down.')
@@ -37,10 +85,86 @@ async def run_event_scraper(start_id: int = 1, end_id: int = 90000, threads: int
     except Exception as e:
         print(f"An error occurred during scraping: {str(e)}")
 
-    all_tables.to_csv(csv_filename, index=False)
-    print(f"All Perfect Game Workout data for Event ID {start_id} through Event ID {end_id} has been saved to '{csv_filename}'")
+    finally:
+        sink.close()
+        metrics.report()
+
+    print(f"{sink.rows_written} Perfect Game Workout rows for Event ID {start_id} through Event ID {end_id} saved to '{csv_filename}' - checkpoint status: {checkpoint.counts()}")
+
+async def scrape_event_players(event_ids, csv_filename: str = 'PG_Event_Players.csv', threads: int = 20, retries: int = 5, client: httpx.AsyncClient = None,
+                               output_format: str = 'csv', parse_workers: int = 0, requests_per_second: float = None, limiter: AdaptiveLimiter = None,
+                               cache: ResponseCache = None) -> pd.DataFrame:
+    '''
+    Scrapes the workout results of the given events, then only the players who took part in them, and saves them joined: one row
+    per player per event with the event's workout results followed by the player's profile. For "everyone at these showcases"
+    jobs this takes one profile fetch per participant instead of a sweep of the whole player ID range.
+
+    PlayerIDs come from the profile links of the workout tables. Each player is fetched once however many of the events they
+    attended, and players are fetched while later events are still coming in.
+
+    Args:
+        event_ids: PG Event IDs to scrape, ex. [9001, 9002] or range(9000, 9100)
+        csv_filename: output file. With 'sqlite' the workout rows and profiles are upserted into the events and players tables of
+            this database instead, joined by `store.query('SELECT * FROM events JOIN players USING (PlayerID)')`.
+        threads: maximum amount of events, and separately of players, fetched at once
+        retries: total attempts allowed per page
+        client: shared httpx client (see Client_utils.create_client). One sized to threads is created if not given.
+        output_format: 'csv', 'parquet' or 'sqlite'. See Output_utils.sink_formats.
+        parse_workers: processes used to parse pages off the event loop. 0 parses inline.
+        requests_per_second: cap on the combined request rate of events and players. None leaves the rate uncapped.
+        limiter: shared concurrency/rate controller. One is created if not given.
+        cache: on-disk response cache, ex. ResponseCache('pg_cache')
+
+    Returns:
+        pd.DataFrame: the joined rows written.
+    '''
+    limiter = limiter or AdaptiveLimiter(maximum=threads, rate=requests_per_second)
+    event_metrics = ScrapeMetrics('events', log_every=30)
+    player_metrics = ScrapeMetrics('players', log_every=30)
+    player_semaphore = Semaphore(threads)
+    tables, fetches = [], {}
+
+    async with shared_client(client, max_connections=threads * 2, max_keepalive_connections=threads * 2) as client, shared_parse_pool(workers=parse_workers) as parse_pool:
+        async def fetch_player(player_id):
+            async with player_semaphore:
+                return await process_player(player_id, retries, client, parse_pool=parse_pool, limiter=limiter, cache=cache, metrics=player_metrics)
+
+        async for event_id, table in stream_events(event_ids, retries, threads, client, parse_pool, limiter, cache, event_metrics):
+            if table is None or table.empty:
+                continue
+            tables.append(table)
+            for player_id in table['PlayerID'].dropna().unique(): #players of several events are fetched once
+                if player_id not in fetches:
+                    fetches[player_id] = asyncio.ensure_future(fetch_player(int(player_id)))
+        player_metrics.total = len(fetches)
+        records = await asyncio.gather(*fetches.values())
+
+    event_metrics.report()
+    player_metrics.report()
+    workouts = normalize_events(pd.concat(tables, ignore_index=True)) if tables else pd.DataFrame(columns=['EventID', 'PlayerID'])
+    players = player_frame(records)
+    joined = workouts.merge(players, on='PlayerID', how='left', suffixes=('', '.Profile'))
+
+    if output_format in table_formats: #the store keeps both sides in their own tables, the join is a query
+        for table, df in (('events', workouts), ('players', players)):
+            sink = open_sink(csv_filename, output_format, table=table)
+            sink.write(df)
+            sink.close()
+    else:
+        sink = open_sink(csv_filename, output_format)
+        sink.write(joined)
+        sink.close()
+
+    print(f"{len(joined)} workout rows of {len(tables)} events joined with {len(players)} of {len(fetches)} participating players saved to '{csv_filename}'")
+    return joined
 
 ''' Example Call'''
 
 if __name__ == '__main__':
+    configure_logging('INFO') #progress summaries every 30 seconds, 'DEBUG' also shows every event ID
     asyncio.run(run_event_scraper(start_id=1, end_id=50000, threads=20, csv_filename='/content/drive/MyDrive/UK Scouting Datasets/pg_all_player_info.csv'))
+
+''' Example Call to Scrape Everyone at Given Showcases'''
+
+#if __name__ == '__main__':
+#    asyncio.run(scrape_event_players(event_ids=[9001, 9002, 9003], csv_filename='pg_showcase_players.csv'))
@@ -1,23 +1,60 @@
 import asyncio
+import os
+from itertools import chain
 import httpx
+from datetime import date
 from bs4 import BeautifulSoup
 import pandas as pd
 import nest_asyncio
 from asyncio import Semaphore
-from pg_scraper_utils.Player_utils import get_player_info, process_player, find_id_from_name, find_ids_from_filters, get_stats_table_info, clean_string
+from pg_scraper_utils.Player_utils import get_player_info, process_player, find_id_from_name, find_ids_from_filters, resolve_player_names, get_stats_table_info, clean_string, clean_player_batch, player_columns, player_frame
+from pg_scraper_utils.Client_utils import shared_client
+from pg_scraper_utils.Scheduler_utils import stream_results
+from pg_scraper_utils.Output_utils import open_sink, Checkpoint, write_stream, checkpoint_name, table_formats
+from pg_scraper_utils.Directory_utils import year_key
+from pg_scraper_utils.Parser_utils import shared_parse_pool
+from pg_scraper_utils.Throttle_utils import AdaptiveLimiter
+from pg_scraper_utils.Cache_utils import ResponseCache
+from pg_scraper_utils.Delta_utils import FingerprintStore, DeltaSink, merge_snapshot, recover_snapshot
+from pg_scraper_utils.Probe_utils import IdIndex, probe_live_ranges, player_exists, with_samples
+from pg_scraper_utils.Metrics_utils import ScrapeMetrics, configure_logging
 
 
-async def scrape_all_players(player_id_start: int, player_id_end: int, csv_filename, threads: int = 20, retries: int = 5) -> None:
+async def scrape_all_players(player_id_start: int, player_id_end: int, csv_filename, threads: int = 20, retries: int = 5, client: httpx.AsyncClient = None,
+                             batch_size: int = 500, checkpoint_filename: str = None, resume: bool = True, output_format: str = 'csv',
+                             parse_workers: int = 0, requests_per_second: float = None, limiter: AdaptiveLimiter = None,
+                             cache: ResponseCache = None, fingerprints: FingerprintStore = None, id_index: IdIndex = None,
+                             probe_block_size: int = 1000, metrics: ScrapeMetrics = None) -> None:
     """
-    Function accesses player data available on Perfect Game through a specified range of Event IDs. Async and Semaphore additions used to hasten process
-	while waiting on site requests. 
+    Function accesses player data available on Perfect Game through a specified range of Event IDs. IDs are fed lazily to a bounded pool of
+	async fetches to hasten process while waiting on site requests. Players are appended to the CSV in batches as they finish and
+    every finished ID is recorded in a checkpoint file, so an interrupted sweep can be rerun over the same range to pick up where it stopped.
     
     Args:
         player_id_start (int): the first PG Player ID in the range of players being scraped
         player_id_end (int):  the last PG Player ID in the range of players being scraped
-        threads (int): amount of semaphores available for use
+        threads (int): maximum amount of players fetched at once
         csv_filename (str): specified name of csv file where player data is being saved
         retries (int): integer indicating the amount of times script can retry in getting a player
+        client (httpx.AsyncClient, optional): shared client (see Client_utils.create_client) used for every request. One sized to threads is created if not given.
+        batch_size (int): amount of finished players collected between writes to the CSV
+        checkpoint_filename (str, optional): file tracking completed and failed IDs. Defaults to csv_filename + '.checkpoint' ('.players.checkpoint' with table formats).
+        resume (bool): skips IDs already completed in the checkpoint and appends to the CSV. False starts the sweep over.
+        output_format (str): 'csv', 'parquet' (typed columns, csv_filename is then a dataset directory) or 'sqlite' (players are upserted
+            into the players table of the csv_filename database, see Store_utils.PGStore). See Output_utils.sink_formats.
+        parse_workers (int): processes used to parse pages off the event loop (see Parser_utils.ParsePool). 0 parses inline, None uses every core.
+        requests_per_second (float, optional): cap on the request rate. None leaves the rate uncapped.
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller, ex. to share one budget with an event sweep.
+            One ramping up to `threads` concurrent requests (backing off on 429/5xx) is created if not given.
+        cache (ResponseCache, optional): on-disk response cache, ex. ResponseCache('pg_cache'). Profiles fetched within its ttl
+            are read from disk and older ones are revalidated, so re-scraping an unchanged range barely touches the site.
+        fingerprints (FingerprintStore, optional): delta mode - only players that are new or whose profile changed since their
+            stored fingerprint are written, and recently changed players are scraped first (see scrape_player_changes).
+        id_index (IdIndex, optional): known player IDs, ex. IdIndex('pg_ids.sqlite', 'player'). When given, the range is probed
+            first (see Probe_utils.probe_live_ranges) and only blocks with valid players are swept. Every ID checked is recorded.
+        probe_block_size (int): IDs per probed block, dead blocks of this size are skipped
+        metrics (ScrapeMetrics, optional): run metrics (see Metrics_utils.ScrapeMetrics), ex. to export them for Prometheus.
+            One logging a progress summary every 30 seconds is created if not given. Per-ID messages are logged at DEBUG.
 
     Returns:
         None: A saved CSV file with a specified name containing all scouting info relating to the Player IDs scraped.
@@ -27,78 +64,216 @@ async def scrape_all_players(player_id_start: int, player_id_end: int, csv_filen
         Exception: Program quits when error occurs.
 
     Notes:
-        Semaphores should be used in moderation as to not overwhelm with site requests.
+        Threads should be used in moderation as to not overwhelm with site requests.
+        Players that failed every retry are not marked complete and are attempted again on resume.
 
     """
-    sem = Semaphore(threads)  # limits number of task, defaults to 20
-    player_ids = range(player_id_start, player_id_end)
-    tasks = []
+    checkpoint = Checkpoint(checkpoint_filename or checkpoint_name(csv_filename, output_format, 'players'), reset=not resume)
+    sink = open_sink(csv_filename, output_format, append=len(checkpoint) > 0, table='players')
+    if fingerprints is not None:
+        sink = DeltaSink(sink, fingerprints)
+    limiter = limiter or AdaptiveLimiter(maximum=threads, rate=requests_per_second)
+    metrics = metrics or ScrapeMetrics('players', total=max(0, player_id_end - player_id_start - len(checkpoint)), log_every=30)
 
-    async def bound_process_player(sem, player_id, retries): #limits simultaneous downloads
-        async with sem: 
-            return await process_player(player_id, retries)
     try:
-        for player_id in player_ids:
-            task = bound_process_player(sem, player_id, retries)
-            tasks.append(task)
-            print(f"Player {player_id} has been added to the queue")
-
-        all_player_info = await asyncio.gather(*tasks)
-        all_player_info = [player for player in all_player_info if player is not None]
-
-        all_player_dict = {}
-        for key in all_player_info[0].keys(): #ensures that array has correct shape
-            try:
-                all_player_dict[key] = [clean_string(player.get(key, '')) for player in all_player_info]  #cleans string outputs if existent
-            except Exception as e:
-                print(f"Error processing column {key}: {str(e)}")
-                all_player_dict[key] = [''] * len(all_player_info)
-    
+        async with shared_client(client, max_connections=threads, max_keepalive_connections=threads) as client, shared_parse_pool(workers=parse_workers) as parse_pool:
+            fetch = lambda player_id: process_player(player_id, retries, client, parse_pool=parse_pool, limiter=limiter, cache=cache, metrics=metrics)
+            player_ids, sampled = range(player_id_start, player_id_end), {}
+            if id_index is not None: #samples the range first so dead stretches of IDs are never swept
+                ranges, sampled = await probe_live_ranges(fetch, player_id_start, player_id_end, id_index, player_exists, probe_block_size, threads=threads)
+                player_ids = (player_id for player_id in chain.from_iterable(ranges) if player_id not in sampled)
+            if fingerprints is not None:
+                player_ids = fingerprints.prioritize(player_ids)
+            player_ids = checkpoint.pending(player_ids)
+
+            # IDs are fed lazily with at most `threads` players in flight, results are written in batches as they finish
+            results = stream_results(fetch, player_ids, threads)
+            if sampled: #players fetched by the probe go straight to the output
+                results = with_samples({player_id: result for player_id, result in sampled.items() if not checkpoint.is_complete(player_id)}, results)
+            if id_index is not None:
+                results = id_index.track(results, player_exists)
+            await write_stream(results, sink, checkpoint, batch_size, prepare=clean_player_batch, columns=player_columns, metrics=metrics)
+
     except KeyboardInterrupt:
         print(f'Keyboard Interrupt caught - shutting down.')
 
     except Exception as e:
         print(f"An error occurred during scraping: {str(e)}")
 
-    all_tables = pd.DataFrame(all_player_dict)
-    print(all_tables)
-    all_tables.to_csv(csv_filename, index=False)
+    finally:
+        sink.close()
+        metrics.report()
 
-async def scrape_player_by_name(player_name: str, retries: int = 5) -> pd.DataFrame:
+    print(f"{sink.rows_written} players for Player ID {player_id_start} through Player ID {player_id_end} saved to '{csv_filename}' - checkpoint status: {checkpoint.counts()}")
+    if fingerprints is not None:
+        print(f"Delta status: {sink.counts()}")
+
+async def scrape_player_changes(player_id_start: int, player_id_end: int, snapshot_filename: str, changes_filename: str = None,
+                                fingerprint_filename: str = None, output_format: str = 'csv', **sweep_kwargs) -> None:
     """
-    Function to scrape players and display info based on a first and last name.
+    Incremental sweep: re-scrapes the range but outputs only players that are new or whose profile changed since the last run,
+    then applies those changes to the full snapshot. Fingerprints of every player's fields are kept between runs in a small
+    SQLite file, and players that changed recently are scraped first.
+
+    Args:
+        player_id_start (int): the first PG Player ID in the range of players being scraped
+        player_id_end (int): the last PG Player ID in the range of players being scraped
+        snapshot_filename (str): full dataset of every player, updated in place at the end of the run
+        changes_filename (str, optional): changes-only dataset of this run. Defaults to the snapshot name with today's date,
+            so a rerun on the same day resumes from its checkpoint and the next day starts a new sweep.
+        fingerprint_filename (str, optional): fingerprint store. Defaults to snapshot_filename + '.fingerprints'.
+        output_format (str): 'csv' or 'parquet', used for both the changes and the snapshot
+        **sweep_kwargs: passed on to scrape_all_players (threads, retries, client, limiter, cache, ...)
+
+    Returns:
+        None: changes saved to changes_filename and the snapshot updated.
+    """
+    root, extension = os.path.splitext(snapshot_filename)
+    changes_filename = changes_filename or f"{root}.changes-{date.today().isoformat()}{extension}"
+    recover_snapshot(snapshot_filename)
+    fingerprints = FingerprintStore(fingerprint_filename or f'{snapshot_filename}.fingerprints')
+    try:
+        await scrape_all_players(player_id_start, player_id_end, changes_filename, output_format=output_format, fingerprints=fingerprints, **sweep_kwargs)
+    finally:
+        fingerprints.close()
+    total = merge_snapshot(snapshot_filename, changes_filename, output_format)
+    print(f"Snapshot '{snapshot_filename}' updated with changes from '{changes_filename}' - {total} players")
+
+async def scrape_player_by_name(player_name: str, retries: int = 5, directory=None, client: httpx.AsyncClient = None) -> pd.DataFrame:
+    """
+    Function to scrape players and display info based on a first and last name. When several players match, every one
+    of them is fetched at once and returned, so the right one can be picked from the frame (see scrape_players_by_names
+    for ranked fuzzy matching of whole lists of names).
 
     Args:
         player_name: The name of the player to search for.
         retries: integer indicating the amount of times script can retry in getting a player
+        directory: where names are looked up - the player ID file by default, or a store of earlier scrapes, ex. PGStore('pg.sqlite')
+        client (httpx.AsyncClient, optional): shared client used for the requests. One is created if not given.
     
     Returns:
-        pd.DataFrame: A df containing info on a matched player.
+        pd.DataFrame: A df containing info on every matched player, empty when the name isn't found.
     """
 
-    matching_players = await find_id_from_name(player_name)
+    matching_players = await find_id_from_name(player_name, directory)
+    if not matching_players:
+        print("Name not found")
+        return player_frame([])
+
     if len(matching_players) == 1:
-        player_id = matching_players[0]['PlayerID']
-        print(f"Found one match: {matching_players[0]['PlayerName']} (ID: {player_id})")
-        player_data = await process_player(player_id, retries)
-        print(player_data)  
-        return player_data
-    elif len(matching_players) > 1:
+        print(f"Found one match: {matching_players[0]['PlayerName']} (ID: {matching_players[0]['PlayerID']})")
+    else:
         print("Found multiple matches:")
         for i, player in enumerate(matching_players, start=1):
             print(f"{i}. {player['PlayerName']} (ID: {player['PlayerID']})")
-        selected_index = int(input("Select player by typing corresponding number: ")) - 1
-        if 0 <= selected_index < len(matching_players):
-            player_id = matching_players[selected_index]['PlayerID']
-            player_data = process_player(player_id, retries)
-            pd.set_option('display.max_rows', 38)
-            print(player_data)
+
+    async with shared_client(client) as client:
+        limiter = AdaptiveLimiter() #a common name can match dozens of players
+        players_data = await asyncio.gather(*(process_player(player['PlayerID'], retries, client, limiter=limiter) for player in matching_players))
+    player_data = player_frame(players_data)
+    pd.set_option('display.max_rows', 38)
+    print(player_data)
+    return player_data
+
+async def scrape_players_by_names(names, csv_filename: str = None, threads: int = 20, retries: int = 5, client: httpx.AsyncClient = None,
+                                  directory=None, accept_confidence: float = 0.85, margin: float = 0.03, candidates: int = 5,
+                                  output_format: str = 'csv', requests_per_second: float = None, limiter: AdaptiveLimiter = None,
+                                  cache: ResponseCache = None, metrics: ScrapeMetrics = None) -> pd.DataFrame:
+    """
+    Resolves a list of player names (ex. a recruiting list) to Perfect Game players without any prompt, then fetches every
+    resolved profile concurrently over one shared client. Names are fuzzy matched against the indexed directory, so typos,
+    missing accents and swapped word order still match, and optional grad year / position hints rank the candidates.
+
+    Every name gets a MatchStatus:
+        'matched': the best candidate reaches accept_confidence and no other candidate is within margin of it
+        'ambiguous': the best candidate reaches accept_confidence but another is within margin of it (its profile is still fetched)
+        'unresolved': candidates were found but none reaches accept_confidence (no profile fetched, see MatchCandidates)
+        'not_found': nothing resembling the name is in the directory
+
+    Args:
+        names: player names, each a string, a (name, graduation_year, position) tuple or a dict with those keys.
+            A DataFrame with name, graduation_year and position columns works too.
+        csv_filename (str, optional): file the result is also saved to
+        threads (int): maximum amount of profiles fetched at once
+        retries (int): integer indicating the amount of times script can retry in getting a player
+        client (httpx.AsyncClient, optional): shared client used for every request. One sized to threads is created if not given.
+        directory: where names are matched - the player ID file by default, or a store of earlier scrapes, ex. PGStore('pg.sqlite')
+        accept_confidence (float): lowest confidence (0-1) a best candidate needs for its profile to be fetched
+        margin (float): confidence gap to the runner-up below which a match is flagged ambiguous
+        candidates (int): candidates kept per name in MatchCandidates
+        output_format (str): 'csv', 'parquet' or 'sqlite' (rows go to the name_matches table, keyed by Query, QueryGradYear and
+            QueryPosition). See Output_utils.sink_formats.
+        requests_per_second (float, optional): cap on the request rate. None leaves the rate uncapped.
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller. One ramping up to `threads` is created if not given.
+        cache (ResponseCache, optional): on-disk response cache, so names resolved in an earlier run aren't fetched again
+        metrics (ScrapeMetrics, optional): run metrics (see Metrics_utils.ScrapeMetrics). One is created if not given.
+
+    Returns:
+        pd.DataFrame: one row per name, in input order: Query, QueryGradYear, QueryPosition, MatchStatus, MatchConfidence,
+            MatchCandidates ("Name (ID) confidence; ...") and the matched player's profile columns.
+    """
+    if isinstance(names, pd.DataFrame):
+        names = names.to_dict('records')
+    resolved = resolve_player_names(names, directory, candidates)
+
+    rows, player_ids = [], []
+    for query, matches in resolved:
+        best = matches[0] if matches else None
+        if best is None:
+            status = 'not_found'
+        elif best['Confidence'] < accept_confidence:
+            status = 'unresolved'
+        elif len(matches) > 1 and best['Confidence'] - matches[1]['Confidence'] < margin:
+            status = 'ambiguous'
         else:
-            print("Invalid Number!")
-    else:
-        print("Name not found")
+            status = 'matched'
+        fetched = status in ('matched', 'ambiguous')
+        if fetched:
+            player_ids.append(best['PlayerID'])
+        rows.append({'Query': query['name'], 'QueryGradYear': query['graduation_year'], 'QueryPosition': query['position'],
+                     'MatchStatus': status, 'MatchConfidence': best['Confidence'] if best else None,
+                     'MatchCandidates': '; '.join(f"{match['PlayerName']} ({match['PlayerID']}) {match['Confidence']:.2f}" for match in matches),
+                     'PlayerID': best['PlayerID'] if fetched else None})
+    matches = pd.DataFrame(rows, columns=['Query', 'QueryGradYear', 'QueryPosition', 'MatchStatus', 'MatchConfidence', 'MatchCandidates', 'PlayerID'])
+    print(f"Resolved {len(matches)} names - status: {matches['MatchStatus'].value_counts().to_dict()}")
+
+    player_ids = list(dict.fromkeys(player_ids)) #the same player listed twice is fetched once
+    limiter = limiter or AdaptiveLimiter(maximum=threads, rate=requests_per_second)
+    metrics = metrics or ScrapeMetrics('players', total=len(player_ids), log_every=30)
+    players_data = []
+    try:
+        async with shared_client(client, max_connections=threads, max_keepalive_connections=threads) as client:
+            fetch = lambda player_id: process_player(player_id, retries, client, limiter=limiter, cache=cache, metrics=metrics)
+            async for _, player_data in stream_results(fetch, player_ids, threads):
+                players_data.append(player_data)
+
+    except KeyboardInterrupt:
+        print(f'Keyboard Interrupt caught - shutting down.')
+
+    except Exception as e:
+        print(f"An error occurred during scraping: {str(e)}")
+
+    finally:
+        metrics.report()
+
+    profiles = player_frame(players_data)
+    matches['PlayerID'] = matches['PlayerID'].astype(profiles['PlayerID'].dtype if len(profiles) else 'Int64')
+    result = matches.merge(profiles, on='PlayerID', how='left')
+
+    if csv_filename:
+        sink = open_sink(csv_filename, output_format, table='name_matches')
+        if output_format in table_formats: #rows are keyed by name and hints, a blank name or hint is '' since NULLs never conflict in a key
+            sink.write(result.assign(Query=result['Query'].fillna(''),
+                                     QueryGradYear=result['QueryGradYear'].map(lambda year: year_key(year) or ''),
+                                     QueryPosition=result['QueryPosition'].map(lambda position: '' if pd.isna(position) else str(position).strip())))
+        else:
+            sink.write(result)
+        sink.close()
+    print(f"{len(profiles)} profiles fetched for {len(result)} names" + (f" and saved to '{csv_filename}'" if csv_filename else ''))
+    return result
         
-async def scrape_players_by_filter(age: int = None, position: str = None, graduation_year: int = None, csv_filename: str = "filtered_pg_players.csv", retries: int = 5) -> None:
+async def scrape_players_by_filter(age: int = None, position: str = None, graduation_year: int = None, csv_filename: str = "filtered_pg_players.csv", retries: int = 5, output_format: str = 'csv',
+                                   directory=None) -> None:
     """
     Function accesses player data for player on Perfect Game meeting a specified criteria. 
     Multiple filters can be used - consult parameters below to ensure Player IDs are filtered properly.
@@ -109,6 +284,9 @@ async def scrape_players_by_filter(age: int = None, position: str = None, gradua
         graduation_year (int): integer with full year of graduation (ex. 2024)
         csv_filename (str): specified name of csv file where player data is being saved
         retries (int): integer indicating the amount of times script can retry in getting a player
+        output_format (str): 'csv', 'parquet' (typed columns, csv_filename is then a dataset directory) or 'sqlite' (players are upserted
+            into the players table of the csv_filename database, see Store_utils.PGStore). See Output_utils.sink_formats.
+        directory: where the filters are looked up - the player ID file by default, or a store of earlier scrapes, ex. PGStore('pg.sqlite')
 
     Returns:
         None: A saved CSV containing all of the necessary info for all of the players that were filtered.
@@ -118,8 +296,9 @@ async def scrape_players_by_filter(age: int = None, position: str = None, gradua
         Exception: Program quits when error occurs.
     """
 
+    players_data = []
     try:
-        filtered_player_ids = await find_ids_from_filters(age=age, position=position, graduation_year=graduation_year)
+        filtered_player_ids = await find_ids_from_filters(age=age, position=position, graduation_year=graduation_year, directory=directory)
         
         if not filtered_player_ids:
             print("No players found with the given filters.")
@@ -127,9 +306,10 @@ async def scrape_players_by_filter(age: int = None, position: str = None, gradua
 
         print(f"Found {len(filtered_player_ids)} players. Processing...")
         
-        async with httpx.AsyncClient() as client:
+        async with shared_client() as client:
             # Creates task for given players IDs
-            tasks = [process_player(player_id, retries) for player_id in filtered_player_ids]
+            limiter = AdaptiveLimiter() #keeps the burst of filtered players within a healthy concurrency
+            tasks = [process_player(player['PlayerID'], retries, client, limiter=limiter) for player in filtered_player_ids]
             
             # Gather player data for given IDs asynchronously
             players_data = await asyncio.gather(*tasks)
@@ -140,8 +320,10 @@ async def scrape_players_by_filter(age: int = None, position: str = None, gradua
     except Exception as e:
         print(f"An error occurred during scraping: {str(e)}")
 
-    players_data = [player for player in players_data if player is not None]
-    pd.DataFrame(players_data).to_csv(csv_filename, index=False)
+    players_data = [player for player in players_data if player]
+    sink = open_sink(csv_filename, output_format, table='players')
+    sink.write(player_frame(players_data))
+    sink.close()
 
     print(f"Filtered data for {len(players_data)} PG players with filters of Age: {age}, Position: {position}, and Grad Year: {graduation_year} has been written to {csv_filename}")
 
@@ -149,6 +331,7 @@ async def scrape_players_by_filter(age: int = None, position: str = None, gradua
 '''Example Call to Scrape All Players'''
 
 if __name__ == '__main__':
+    configure_logging('INFO') #progress summaries every 30 seconds, 'DEBUG' also shows every player ID
     asyncio.run(scrape_all_players(player_id_start=0, player_id_end=50, csv_filename='/Users/dylandrummey/Downloads/(R) UK Baseball/UK Scouting Database/prev_pg_all_event_info.csv'))
 
 '''Example Call to Scrape Player by Name'''
@@ -156,7 +339,17 @@ if __name__ == '__main__':
 #if __name__ == '__main__':
 #    asyncio.run(scrape_player_by_name(player_name="Cade Arrambide"))
 
+'''Example Call to Resolve a List of Names with Grad Year and Position Hints'''
+
+#if __name__ == '__main__':
+#    asyncio.run(scrape_players_by_names(["Cade Arrambide", ("Jon Smith", 2025, "RHP"), {'name': "jose gonzalez", 'graduation_year': 2024}],
+#                                        csv_filename='pg_name_matches.csv'))
+
 '''Example Call to Scrape Players that meet Certain Criteria'''
 
 #if __name__ == '__main__':
-#    asyncio.run(scrape_players_by_filter(age=18, position="C", graduation_year=2024))
\ No newline at end of file
+#    asyncio.run(scrape_players_by_filter(age=18, position="C", graduation_year=2024))
+'''Example Call to Nightly Re-scrape Only Changed Players'''
+
+#if __name__ == '__main__':
+#    asyncio.run(scrape_player_changes(player_id_start=0, player_id_end=50, snapshot_filename='pg_all_player_info.csv'))
@@ -1,13 +1,28 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+try: #only the browser engine (scrape_rankings_table) needs selenium
+    from selenium import webdriver
+except ImportError:
+    webdriver = None
 from bs4 import BeautifulSoup
-import csv
+import asyncio
+import httpx
+import pandas as pd
 import time
-from pg_scraper_utils.Ranking_utils import scrape_rankings_page, navigate_to_next_page, ranking_fieldnames
+from pg_scraper_utils.Ranking_utils import scrape_rankings_page, navigate_to_next_page, ranking_fieldnames, stream_rankings_pages
+from pg_scraper_utils.Output_utils import open_sink, table_formats
+from pg_scraper_utils.Normalize_utils import normalize_rankings
+from pg_scraper_utils.Client_utils import shared_client
+from pg_scraper_utils.Parser_utils import ParsePool, shared_parse_pool
+from pg_scraper_utils.Throttle_utils import AdaptiveLimiter
+from pg_scraper_utils.Metrics_utils import ScrapeMetrics, configure_logging, logger, failure_reason
+from pg_scraper_utils.Player_utils import process_player, player_frame
+from pg_scraper_utils.Cache_utils import ResponseCache
 
-def scrape_rankings_table(year: int, max_pages: int = 20) -> None:
+def rankings_filename(year: int, max_pages: int, output_format: str) -> str:
+    if output_format in table_formats: #every year goes into one database, keyed by Year
+        return f'PG_Player_Rankings.{output_format}'
+    return f'{year}_PG_Top_{max_pages * 100}_Player_Rankings.{output_format}'
+
+def scrape_rankings_table(year: int, max_pages: int = 20, output_format: str = 'csv', filename: str = None) -> None:
     """
     Scrapes PG rankings for a given year and saves to a CSV file named based on amount of players. 
     Note: National Rankings are considered equal after 500. 
@@ -15,6 +30,9 @@ def scrape_rankings_table(year: int, max_pages: int = 20) -> None:
     Args:
         year (int): The year for which to scrape rankings.
         max_pages (int, optional): Number of pages to scrape (100 players per page). Defaults to 20.
+        output_format (str, optional): 'csv', 'parquet' (typed columns, written as a dataset directory) or 'sqlite' (upserted
+            into the rankings table of a database, keyed by Year, NatPGRank and PlayerName). Defaults to 'csv'.
+        filename (str, optional): output file. Defaults to one file per year, or PG_Player_Rankings.sqlite for every year.
 
     Returns:
         None: Ranking data written to saved CSV file.
@@ -23,8 +41,12 @@ def scrape_rankings_table(year: int, max_pages: int = 20) -> None:
         KeyboardInterrupt: Program quits when User hits CTRL+C.
         Exception: Program quits when error occurs.
     """
+    if webdriver is None:
+        raise ImportError("selenium is required for the browser engine - install it with 'pip install selenium' or use scrape_rankings_http")
+
     url = f'https://www.perfectgame.org/Rankings/Players/NationalRankings.aspx?gyear={year}'
-    csv_filename = f'{year}_PG_Top_{max_pages * 100}_Player_Rankings.csv'
+    filename = filename or rankings_filename(year, max_pages, output_format)
+    sink = open_sink(filename, output_format, table='rankings', fixed={'Year': year})
     
     driver = webdriver.Chrome()
     driver.get(url)
@@ -45,11 +67,7 @@ def scrape_rankings_table(year: int, max_pages: int = 20) -> None:
             
             total_players += len(players_data)
             
-            with open(csv_filename, 'a' if page > 1 else 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=ranking_fieldnames)
-                if page == 1:
-                    writer.writeheader()
-                writer.writerows(players_data) #adds data to CSV for each page as it scrapes
+            sink.write(normalize_rankings(pd.DataFrame(players_data, columns=ranking_fieldnames))) #adds data to output for each page as it scrapes
     
             print(f"Scraped Page {page} - Total Players Scraped: {total_players}")
             
@@ -65,10 +83,204 @@ def scrape_rankings_table(year: int, max_pages: int = 20) -> None:
 
     finally:
         driver.quit()
+        sink.close()
 
     print(f"Scraping complete. Total players scraped: {total_players}")
 
+async def scrape_rankings_http(year: int, max_pages: int = 20, output_format: str = 'csv', retries: int = 5, client: httpx.AsyncClient = None,
+                               limiter: AdaptiveLimiter = None, parse_pool: ParsePool = None, parse_workers: int = 0, filename: str = None,
+                               metrics: ScrapeMetrics = None) -> int:
+    """
+    Scrapes PG rankings for a given year without a browser, replaying the site's postback paging over HTTP
+    (see Ranking_utils.stream_rankings_pages), and saves them to the same file, with the same columns, as scrape_rankings_table.
+
+    Args:
+        year (int): The year for which to scrape rankings.
+        max_pages (int, optional): Number of pages to scrape (100 players per page). Defaults to 20.
+        output_format (str, optional): 'csv', 'parquet' (typed columns, written as a dataset directory) or 'sqlite' (upserted
+            into the rankings table of a database, keyed by Year, NatPGRank and PlayerName). Defaults to 'csv'.
+        retries (int, optional): total attempts allowed per page. Defaults to 5.
+        client (httpx.AsyncClient, optional): shared client (see Client_utils.create_client). One is created if not given.
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller, ex. one budget across several years.
+        parse_pool (ParsePool, optional): shared process pool pages are parsed in. One with parse_workers processes is created if not given.
+        parse_workers (int, optional): processes used to parse pages when no parse_pool is given. 0 parses inline.
+        filename (str, optional): output file. Defaults to one file per year, or PG_Player_Rankings.sqlite for every year.
+        metrics (ScrapeMetrics, optional): run metrics counting pages (see Metrics_utils.ScrapeMetrics), ex. shared by several years.
+            One is created if not given. Per-page messages are logged at DEBUG.
+
+    Returns:
+        int: total players written. Pages written before a CTRL+C are kept, and the metrics still reported.
+    """
+    filename = filename or rankings_filename(year, max_pages, output_format)
+    sink = open_sink(filename, output_format, table='rankings', fixed={'Year': year})
+    limiter = limiter or AdaptiveLimiter()
+    own_metrics = metrics is None #shared metrics are reported once by whoever created them
+    metrics = metrics or ScrapeMetrics('rankings', total=max_pages)
+
+    total_players = 0
+
+    try:
+        async with shared_client(client) as client, shared_parse_pool(parse_pool, parse_workers) as parse_pool:
+            async for page in stream_rankings_pages(client, year, max_pages, retries, limiter, parse_pool, metrics=metrics):
+                players_data = [player for player in page.players if player['PlayerName'] != 'N/A']
+                if not players_data:
+                    metrics.record('empty')
+                    print(f"No data found on {year} page {page.number}. Stopping.")
+                    break
+
+                total_players += len(players_data)
+                with metrics.stage('write'):
+                    sink.write(normalize_rankings(pd.DataFrame(players_data, columns=ranking_fieldnames)))
+                metrics.record('done')
+                logger.debug(f"Scraped {year} Page {page.number} - Total Players Scraped: {total_players}", extra={'year': year, 'page': page.number})
+
+    except (KeyboardInterrupt, asyncio.CancelledError): #under asyncio.run CTRL+C reaches the coroutine as a cancellation
+        print(f'Keyboard Interrupt caught - shutting down {year}.')
+
+    except Exception as e:
+        metrics.record('failed', failure_reason(e))
+        print(f"An error occurred during scraping {year}: {str(e)}")
+
+    finally:
+        sink.close()
+        if own_metrics:
+            metrics.report()
+
+    print(f"Scraping complete for {year}. Total players scraped: {total_players}")
+    return total_players
+
+async def scrape_rankings_years(years: list, max_pages: int = 20, output_format: str = 'csv', retries: int = 5, client: httpx.AsyncClient = None,
+                                requests_per_second: float = None, limiter: AdaptiveLimiter = None, parse_workers: int = 0,
+                                database: str = None, metrics: ScrapeMetrics = None) -> dict:
+    """
+    Scrapes the rankings of several graduation years in parallel over HTTP, one file per year (see scrape_rankings_http).
+    Every year shares one client, parse pool and limiter, so the combined request load stays within one budget.
+
+    Args:
+        years (list): graduation years to scrape, ex. range(2024, 2029)
+        max_pages (int, optional): Number of pages to scrape per year. Defaults to 20.
+        output_format (str, optional): 'csv', 'parquet' or 'sqlite' (every year into one database). Defaults to 'csv'.
+        retries (int, optional): total attempts allowed per page. Defaults to 5.
+        client (httpx.AsyncClient, optional): shared client. One is created if not given.
+        requests_per_second (float, optional): cap on the combined request rate. None leaves the rate uncapped.
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller. One is created if not given.
+        parse_workers (int, optional): processes used to parse pages. 0 parses inline.
+        database (str, optional): database file every year is written to with 'sqlite' output. Defaults to PG_Player_Rankings.sqlite.
+        metrics (ScrapeMetrics, optional): run metrics shared by every year. One logging a progress summary every 30 seconds is created if not given.
+
+    Returns:
+        dict: year -> total players written.
+    """
+    limiter = limiter or AdaptiveLimiter(rate=requests_per_second)
+    metrics = metrics or ScrapeMetrics('rankings', total=len(years) * max_pages, log_every=30)
+    async with shared_client(client) as client, shared_parse_pool(workers=parse_workers) as parse_pool:
+        filename = database if output_format in table_formats else None
+        totals = await asyncio.gather(*(scrape_rankings_http(year, max_pages, output_format, retries, client, limiter, parse_pool,
+                                                             filename=filename, metrics=metrics) for year in years))
+    metrics.report()
+    return dict(zip(years, totals))
+
+async def scrape_rankings_profiles(year: int, max_pages: int = 20, filename: str = None, threads: int = 20, retries: int = 5,
+                                   client: httpx.AsyncClient = None, output_format: str = 'csv', parse_workers: int = 0,
+                                   requests_per_second: float = None, limiter: AdaptiveLimiter = None, cache: ResponseCache = None) -> pd.DataFrame:
+    """
+    Scrapes a year's rankings over HTTP and the full profile (info and class stats) of every ranked player, saved as one
+    dataset: each ranking row followed by the player's profile columns. Profiles are fetched as soon as the page listing
+    the player arrives, while the rankings keep paging, so the whole class takes about as long as the slower of the two.
+
+    Players are joined by the PlayerID of their rankings name link, profile columns also in the rankings (PlayerName,
+    Position, Height, ...) are suffixed '.Profile'.
+
+    Args:
+        year (int): The year for which to scrape rankings.
+        max_pages (int, optional): Number of pages to scrape (100 players per page). Defaults to 20.
+        filename (str, optional): output file. Defaults to one file per year, or PG_Player_Rankings.sqlite with 'sqlite', where the
+            rankings and profiles are upserted into the rankings and players tables instead, joined by
+            `store.query('SELECT * FROM rankings JOIN players USING (PlayerID) WHERE Year = ?', [year])`.
+        threads (int, optional): maximum amount of profiles fetched at once. Defaults to 20.
+        retries (int, optional): total attempts allowed per page. Defaults to 5.
+        client (httpx.AsyncClient, optional): shared client. One sized for the pages and profiles is created if not given.
+        output_format (str, optional): 'csv', 'parquet' or 'sqlite'. See Output_utils.sink_formats. Defaults to 'csv'.
+        parse_workers (int, optional): processes used to parse pages off the event loop. 0 parses inline.
+        requests_per_second (float, optional): cap on the combined request rate of pages and profiles. None leaves the rate uncapped.
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller. One is created if not given.
+        cache (ResponseCache, optional): on-disk response cache for the profiles, ex. ResponseCache('pg_cache')
+
+    Returns:
+        pd.DataFrame: the joined rows written.
+    """
+    if filename is None:
+        filename = rankings_filename(year, max_pages, output_format) if output_format in table_formats else \
+            f'{year}_PG_Top_{max_pages * 100}_Player_Rankings_Profiles.{output_format}'
+    limiter = limiter or AdaptiveLimiter(maximum=threads, rate=requests_per_second)
+    rankings_metrics = ScrapeMetrics('rankings', total=max_pages, log_every=30)
+    player_metrics = ScrapeMetrics('players', log_every=30)
+    player_semaphore = asyncio.Semaphore(threads)
+    pages, fetches = [], {}
+
+    try:
+        async with shared_client(client, max_connections=threads * 2, max_keepalive_connections=threads * 2) as client, shared_parse_pool(workers=parse_workers) as parse_pool:
+            async def fetch_player(player_id):
+                async with player_semaphore:
+                    return await process_player(player_id, retries, client, parse_pool=parse_pool, limiter=limiter, cache=cache, metrics=player_metrics)
+
+            try:
+                async for page in stream_rankings_pages(client, year, max_pages, retries, limiter, parse_pool, metrics=rankings_metrics):
+                    players_data = [player for player in page.players if player['PlayerName'] != 'N/A']
+                    if not players_data:
+                        rankings_metrics.record('empty')
+                        print(f"No data found on {year} page {page.number}. Stopping.")
+                        break
+                    pages.append(pd.DataFrame(players_data, columns=ranking_fieldnames))
+                    rankings_metrics.record('done')
+                    for player in players_data: #profiles start while the next pages are still paging
+                        if player['PlayerID'] is not None and player['PlayerID'] not in fetches:
+                            fetches[player['PlayerID']] = asyncio.ensure_future(fetch_player(player['PlayerID']))
+                    player_metrics.total = len(fetches)
+                    logger.debug(f"Scraped {year} Page {page.number} - {len(fetches)} profiles queued", extra={'year': year, 'page': page.number})
+
+            except Exception as e: #profiles of the pages already scraped are still fetched and saved
+                rankings_metrics.record('failed', failure_reason(e))
+                print(f"An error occurred during scraping {year}: {str(e)}")
+
+            records = await asyncio.gather(*fetches.values())
+
+    finally:
+        for fetch in fetches.values():
+            fetch.cancel()
+        rankings_metrics.report()
+        player_metrics.report()
+
+    rankings = normalize_rankings(pd.concat(pages, ignore_index=True) if pages else pd.DataFrame(columns=ranking_fieldnames))
+    players = player_frame(records)
+    joined = rankings.merge(players, on='PlayerID', how='left', suffixes=('', '.Profile'))
+
+    if output_format in table_formats: #the store keeps both sides in their own tables, the join is a query
+        for table, df, fixed in (('rankings', rankings, {'Year': year}), ('players', players, None)):
+            sink = open_sink(filename, output_format, table=table, fixed=fixed)
+            sink.write(df)
+            sink.close()
+    else:
+        sink = open_sink(filename, output_format)
+        sink.write(joined)
+        sink.close()
+
+    print(f"{len(rankings)} ranked {year} players joined with {len(players)} of {len(fetches)} profiles saved to '{filename}'")
+    return joined
+
 #Example Call
 
 if __name__ == '__main__':
-    scrape_rankings_table(year=2023, max_pages=25)
\ No newline at end of file
+    configure_logging('INFO')
+    asyncio.run(scrape_rankings_years(years=[2023, 2024, 2025], max_pages=25))
+
+#Rankings of a class with every ranked player's profile
+
+#if __name__ == '__main__':
+#    configure_logging('INFO')
+#    asyncio.run(scrape_rankings_profiles(year=2025, max_pages=10))
+
+#Browser engine (requires selenium and Chrome)
+
+#if __name__ == '__main__':
+#    scrape_rankings_table(year=2023, max_pages=25)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import asyncio
+import multiprocessing
+import os
+from pg_scraper_utils.Client_utils import create_client, PG_BASE_URL
+from pg_scraper_utils.Throttle_utils import AdaptiveLimiter
+from pg_scraper_utils.Shard_utils import ShardLeases, shard_filename, shard_complete, merge_shards, worker_name
+from pg_scraper_utils.Metrics_utils import logger, configure_logging
+from PG_Player_Scraper import scrape_all_players
+from PG_Event_Scraper import run_event_scraper
+
+
+async def sweep_shard(kind: str, start: int, end: int, filename: str, output_format: str, client, limiter: AdaptiveLimiter, threads: int, **scrape_kwargs):
+    if kind == 'players':
+        await scrape_all_players(start, end, filename, threads=threads, client=client, limiter=limiter, output_format=output_format, **scrape_kwargs)
+    elif kind == 'events':
+        await run_event_scraper(start, end, threads=threads, csv_filename=filename, client=client, limiter=limiter, output_format=output_format, **scrape_kwargs)
+    else:
+        raise ValueError(f"Unknown sweep '{kind}' - choose 'players' or 'events'")
+
+
+async def hold_lease(leases: ShardLeases, kind: str, start: int, worker: str, lease_seconds: float, sweep: asyncio.Task):
+    #renews the lease while the shard is swept, stops the sweep if the lease was lost to another worker
+    while not sweep.done():
+        await asyncio.sleep(lease_seconds / 3)
+        if not leases.renew(kind, start, worker, lease_seconds):
+            logger.warning(f"Lost the lease on shard {start} - stopping it")
+            sweep.cancel()
+            return
+
+
+async def run_shard_worker(kind: str, lease_filename: str, shard_dir: str, output_format: str = 'csv', threads: int = 20,
+                           requests_per_second: float = None, lease_seconds: float = 600, poll_seconds: float = 5,
+                           base_url: str = PG_BASE_URL, worker: str = None, **scrape_kwargs) -> int:
+    """
+    Worker of a sharded sweep: leases shards from the lease file and sweeps them one after another with scrape_all_players or
+    run_event_scraper, each into its own output file in shard_dir, until no shard is left. Run it on any machine that can
+    open the lease file and shard_dir (ex. on a shared drive) to add it to a sweep started by scrape_sharded.
+
+    A shard whose sweep ends with failed IDs is handed back and leased again (its checkpoint keeps the IDs already done).
+    The worker keeps one client and one limiter across its shards.
+
+    Args:
+        kind (str): 'players' or 'events'
+        lease_filename (str): lease file of the sweep (see Shard_utils.ShardLeases)
+        shard_dir (str): directory the shard outputs are written to
+        output_format (str): 'csv', 'parquet' or 'sqlite'
+        threads (int): maximum amount of IDs fetched at once by this worker
+        requests_per_second (float, optional): this worker's share of the request rate budget. None leaves it uncapped.
+        lease_seconds (float): seconds a lease lasts without renewal, a crashed worker's shard is re-leased after this
+        poll_seconds (float): wait between checks when every shard is leased but not all are finished
+        base_url (str): site root, ex. a local mock server for benchmarks
+        worker (str, optional): name recorded on the leases. Defaults to hostname-pid.
+        **scrape_kwargs: plain values passed on to the scraper (retries, batch_size, parse_workers, ...)
+
+    Returns:
+        int: shards this worker completed.
+    """
+    worker = worker or worker_name()
+    os.makedirs(shard_dir, exist_ok=True)
+    leases = ShardLeases(lease_filename)
+    limiter = AdaptiveLimiter(maximum=threads, rate=requests_per_second)
+    completed = 0
+
+    try:
+        async with create_client(max_connections=threads, max_keepalive_connections=threads, base_url=base_url) as client:
+            while True:
+                shard = leases.lease(kind, worker, lease_seconds)
+                if shard is None:
+                    if not leases.active(kind):
+                        break
+                    await asyncio.sleep(poll_seconds) #leased shards may still come back if their worker dies
+                    continue
+
+                start, end = shard
+                filename = shard_filename(shard_dir, kind, start, end, output_format)
+                logger.info(f"{worker} sweeping {kind} shard {start}-{end}")
+                sweep = asyncio.create_task(sweep_shard(kind, start, end, filename, output_format, client, limiter, threads, **scrape_kwargs))
+                heartbeat = asyncio.create_task(hold_lease(leases, kind, start, worker, lease_seconds, sweep))
+                try:
+                    await sweep
+                except asyncio.CancelledError:
+                    if not sweep.cancelled():
+                        raise
+                    continue #lease lost, the shard belongs to another worker now
+                finally:
+                    heartbeat.cancel()
+
+                if shard_complete(filename, output_format, kind, start, end):
+                    leases.complete(kind, start, worker, filename)
+                    completed += 1
+                else:
+                    logger.warning(f"Shard {start}-{end} finished with failed IDs - handing it back")
+                    leases.release(kind, start, worker)
+    finally:
+        leases.close()
+
+    logger.info(f"{worker} done - {completed} shards completed")
+    return completed
+
+
+def worker_process(kind: str, lease_filename: str, shard_dir: str, output_format: str, kwargs: dict):
+    configure_logging('INFO')
+    asyncio.run(run_shard_worker(kind, lease_filename, shard_dir, output_format, **kwargs))
+
+
+async def scrape_sharded(kind: str, start: int, end: int, output_filename: str, workers: int = 4, shard_size: int = 5000,
+                         output_format: str = 'csv', lease_filename: str = None, shard_dir: str = None, threads: int = 20,
+                         requests_per_second: float = None, lease_seconds: float = 600, poll_seconds: float = 5,
+                         base_url: str = PG_BASE_URL, **scrape_kwargs) -> int:
+    """
+    Sweeps a player or event ID range with several worker processes instead of one event loop. The range is split into
+    shards in a lease table that local workers (and workers on other machines, see run_shard_worker) take shards from,
+    and every shard's output is merged into one dataset once no shard is left.
+
+    Rerunning with the same output_filename resumes the sweep: finished shards are kept and unfinished ones resume from
+    their checkpoints.
+
+    Args:
+        kind (str): 'players' (scrape_all_players) or 'events' (run_event_scraper)
+        start (int): first ID of the range
+        end (int): end of the range (exclusive, like the scrapers)
+        output_filename (str): merged dataset
+        workers (int): local worker processes. 0 only plans the shards, waits for remote workers and merges.
+        shard_size (int): IDs per shard. Smaller shards spread more evenly and lose less on a crash.
+        output_format (str): 'csv', 'parquet' or 'sqlite', for the shards and the merged dataset
+        lease_filename (str, optional): lease file. Defaults to output_filename + '.leases'.
+        shard_dir (str, optional): directory of the shard outputs. Defaults to output_filename + '.shards'.
+        threads (int): maximum amount of IDs fetched at once per worker
+        requests_per_second (float, optional): request rate budget of all local workers, split evenly between them
+        lease_seconds (float): seconds a lease lasts without renewal
+        poll_seconds (float): wait between checks while shards are leased by other workers
+        base_url (str): site root, ex. a local mock server for benchmarks
+        **scrape_kwargs: plain values passed on to the scraper (retries, batch_size, parse_workers, ...)
+
+    Returns:
+        int: rows in the merged dataset.
+    """
+    lease_filename = lease_filename or f'{output_filename}.leases'
+    shard_dir = shard_dir or f'{output_filename}.shards'
+    leases = ShardLeases(lease_filename)
+    try:
+        total = leases.plan(kind, start, end, shard_size)
+        print(f"{total} {kind} shards of up to {shard_size} IDs - status: {leases.counts(kind)}")
+
+        kwargs = dict(scrape_kwargs, threads=threads, lease_seconds=lease_seconds, poll_seconds=poll_seconds, base_url=base_url,
+                      requests_per_second=requests_per_second / workers if requests_per_second and workers else None)
+        spawn = multiprocessing.get_context('spawn') #fresh interpreters, nothing inherited from this event loop
+        processes = [spawn.Process(target=worker_process, args=(kind, lease_filename, shard_dir, output_format, kwargs)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, process.join) for process in processes))
+
+        while leases.active(kind) or leases.counts(kind).get('pending'): #remote workers still going
+            await asyncio.sleep(poll_seconds)
+
+        counts = leases.counts(kind)
+        rows = merge_shards(leases, kind, output_filename, output_format, shard_dir)
+    finally:
+        leases.close()
+
+    print(f"{rows} rows from {counts.get('done', 0)} of {total} shards merged into '{output_filename}' - shard status: {counts}")
+    return rows
+
+'''Example Call to Sweep Players with 4 Local Worker Processes'''
+
+if __name__ == '__main__':
+    asyncio.run(scrape_sharded('players', 1, 100000, 'pg_all_player_info.csv', workers=4, shard_size=5000, requests_per_second=40))
+
+'''Example Call to Add Another Machine to the Sweep (lease file and shards on a shared drive)'''
+
+#if __name__ == '__main__':
+#    configure_logging('INFO')
+#    asyncio.run(run_shard_worker('players', '/mnt/shared/pg_all_player_info.csv.leases', '/mnt/shared/pg_all_player_info.csv.shards', requests_per_second=10))
@@ -0,0 +1,58 @@
+'''
+Compares requests/sec of process_player when a new client is opened per request (previous behaviour)
+against one pooled client shared by the whole run.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_http_client --requests 2000 --threads 20
+'''
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from pg_scraper_utils.Client_utils import create_client
+from pg_scraper_utils.Player_utils import process_player
+from benchmarks.mock_pg_server import MockPGServer
+
+
+async def run_per_request_clients(base_url: str, n_requests: int, threads: int) -> float:
+    sem = asyncio.Semaphore(threads)
+
+    async def fetch(player_id):
+        async with sem, create_client(base_url=base_url) as client:
+            return await process_player(player_id, 1, client)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch(player_id) for player_id in range(n_requests)))
+    return n_requests / (time.perf_counter() - start)
+
+
+async def run_shared_client(base_url: str, n_requests: int, threads: int) -> float:
+    sem = asyncio.Semaphore(threads)
+
+    async with create_client(base_url=base_url, max_connections=threads, max_keepalive_connections=threads) as client:
+        async def fetch(player_id):
+            async with sem:
+                return await process_player(player_id, 1, client)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch(player_id) for player_id in range(n_requests)))
+        return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=20)
+    args = parser.parse_args()
+
+    with MockPGServer() as server, contextlib.redirect_stdout(io.StringIO()):  # hides per-player prints
+        before = asyncio.run(run_per_request_clients(server.base_url, args.requests, args.threads))
+        after = asyncio.run(run_shared_client(server.base_url, args.requests, args.threads))
+
+    print(f"Client per request: {before:8.1f} req/s")
+    print(f"Shared client:      {after:8.1f} req/s ({after / before:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+In-memory footprint and typing time of scraped batches before and after Normalize_utils, for each scraper:
+players (profile + stats table), event workout tables and rankings, built by repeating the recorded fixtures.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_normalize --rows 20000
+'''
+import argparse
+import time
+import pandas as pd
+from pg_scraper_utils.Player_utils import parse_player_page, player_columns, clean_player_batch
+from pg_scraper_utils.Event_utils import parse_event_page
+from pg_scraper_utils.Ranking_utils import parse_rankings_html, ranking_fieldnames
+from pg_scraper_utils.Normalize_utils import normalize_events, normalize_rankings
+from benchmarks.mock_pg_server import load_fixture
+
+
+def repeat(df, rows):
+    return pd.concat([df] * (rows // len(df) + 1), ignore_index=True).head(rows)
+
+
+def raw_text(df):
+    #everything as scraped strings, the way every field used to reach the output
+    return df.astype(str).where(df.notna(), 'N/A').astype(object)
+
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    player = pd.DataFrame([parse_player_page(load_fixture('player_profile.html'), 1)], columns=player_columns)
+    batches = {
+        'players': (raw_text(repeat(player, args.rows)).assign(PlayerID=[str(i) for i in range(args.rows)]), clean_player_batch),
+        'events': (raw_text(repeat(parse_event_page(load_fixture('workout_results.html')), args.rows)), normalize_events),
+        'rankings': (raw_text(repeat(pd.DataFrame(parse_rankings_html(load_fixture('national_rankings.html')), columns=ranking_fieldnames), args.rows)),
+                     normalize_rankings),
+    }
+
+    print(f"{'batch':<10}{'rows':>8}{'raw MB':>10}{'typed MB':>10}{'saved':>8}{'typing ms':>11}")
+    for name, (raw, normalize) in batches.items():
+        start = time.perf_counter()
+        typed = normalize(raw)
+        elapsed = (time.perf_counter() - start) * 1000
+        before, after = megabytes(raw), megabytes(typed)
+        print(f"{name:<10}{len(raw):>8}{before:>10.2f}{after:>10.2f}{1 - after / before:>8.0%}{elapsed:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''
+Measures how page parsing throughput scales with the amount of ParsePool worker processes.
+
+Pages are handed to the pool as raw bytes from an async driver, the same way process_player and
+process_event hand over fetched responses, so the numbers reflect the event loop's view.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_parse_pool --pages 400 --workers 0 1 2 4
+'''
+import argparse
+import asyncio
+import os
+import time
+from pg_scraper_utils.Parser_utils import ParsePool
+from pg_scraper_utils.Player_utils import parse_player_page
+from pg_scraper_utils.Event_utils import parse_event_page
+from benchmarks.mock_pg_server import load_fixture
+
+
+async def parse_all(pool: ParsePool, n_pages: int) -> float:
+    profile = load_fixture('player_profile.html')
+    workout = load_fixture('workout_results.html')
+
+    async def parse(i):
+        if i % 2:
+            return await pool.run(parse_player_page, profile, i)
+        return await pool.run(parse_event_page, workout)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(parse(i) for i in range(n_pages)))
+    return n_pages / (time.perf_counter() - start)
+
+
+async def run_with_workers(workers: int, n_pages: int) -> float:
+    pool = ParsePool(workers)
+    try:
+        if pool.executor is not None:
+            await parse_all(pool, pool.workers * 2)  # starts the worker processes before timing
+        return await parse_all(pool, n_pages)
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores available")
+    print(f"{'workers':>8}{'pages/s':>12}{'scaling':>10}")
+    baseline = None
+    for workers in args.workers:
+        rate = asyncio.run(run_with_workers(workers, args.pages))
+        baseline = baseline or rate
+        print(f"{workers:>8}{rate:>12.1f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
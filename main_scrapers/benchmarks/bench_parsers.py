@@ -0,0 +1,93 @@
+'''
+Parse micro-benchmark over the saved fixture pages, comparing the previous BeautifulSoup find-per-field path
+against each installed Parser_utils engine.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_parsers --iterations 200
+'''
+import argparse
+import time
+from bs4 import BeautifulSoup
+from pg_scraper_utils.Parser_utils import parse_page, available_engines
+from pg_scraper_utils.Player_utils import get_player_info, get_stats_table_info
+from pg_scraper_utils.Event_utils import get_showcase_info
+from pg_scraper_utils.Ranking_utils import parse_rankings_html, ranking_fields
+from benchmarks.mock_pg_server import load_fixture
+
+profile_ids = ['ContentTopLevel_ContentPlaceHolder1_lblPlayerName', 'ContentTopLevel_ContentPlaceHolder1_hl4yearCommit',
+               'ContentTopLevel_ContentPlaceHolder1_lblBestPGGrade', 'ContentTopLevel_ContentPlaceHolder1_lblHSGrad',
+               'ContentTopLevel_ContentPlaceHolder1_lblPos', 'ContentTopLevel_ContentPlaceHolder1_lblHomeTown',
+               'ContentTopLevel_ContentPlaceHolder1_hlTournamentTeam', 'ContentTopLevel_ContentPlaceHolder1_lblHS',
+               'ContentTopLevel_ContentPlaceHolder1_lblBT', 'ContentTopLevel_ContentPlaceHolder1_lblAge',
+               'ContentTopLevel_ContentPlaceHolder1_lblHt', 'ContentTopLevel_ContentPlaceHolder1_lblWt',
+               'ContentTopLevel_ContentPlaceHolder1_lblPGEventResultsFB', 'ContentTopLevel_ContentPlaceHolder1_lblPGEventResults60',
+               'ContentTopLevel_ContentPlaceHolder1_lblPGEventResults10', 'ContentTopLevel_ContentPlaceHolder1_lblPGEventResultsOF',
+               'ContentTopLevel_ContentPlaceHolder1_lblPGEventResultsIF', 'ContentTopLevel_ContentPlaceHolder1_lblPGEventResults1B',
+               'ContentTopLevel_ContentPlaceHolder1_lblPGEventResultsExitVelo']
+
+
+def legacy_profile(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    info = {element_id: soup.find(id=element_id).text if soup.find(id=element_id) else 'N/A' for element_id in profile_ids}
+    table = soup.find('table', {'class': 'table table-condensed'})
+    for row in table.find_all('tr')[1:]:
+        info[row.find_all('td')[0].text] = [td.text.strip() for td in row.find_all('td')[1:]]
+    return info
+
+
+def legacy_rankings(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    rows = soup.find('table', {'id': 'ContentTopLevel_ContentPlaceHolder1_gvPlayers'}).find_all('tr')[1:]
+    players = []
+    for i in range(0, len(rows), 2):
+        player = {}
+        for field, (tag, id_start) in ranking_fields.items():
+            element = rows[i].find(tag, {'id': lambda x: x and x.startswith(id_start)})
+            player[field] = element.text.strip() if element else 'N/A'
+        players.append(player)
+    return players
+
+
+def legacy_showcase(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return (soup.find('a', {'id': 'ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblEventNameNew'}),
+            soup.find('span', {'id': 'ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblDatesNew'}))
+
+
+def engine_profile(html, engine):
+    page = parse_page(html, engine)
+    info = get_player_info(page)
+    info.update(get_stats_table_info(page))
+    return info
+
+
+def time_per_page(func, html, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    pages = {
+        'PlayerProfile': (load_fixture('player_profile.html').decode(), legacy_profile, engine_profile),
+        'NationalRankings': (load_fixture('national_rankings.html').decode(), legacy_rankings, parse_rankings_html),
+        'WorkoutResults header': (load_fixture('workout_results.html').decode(), legacy_showcase,
+                                  lambda html, engine: get_showcase_info(parse_page(html, engine))),
+    }
+
+    print(f"{'page':<24}{'engine':<22}{'ms/page':>10}{'speedup':>10}")
+    for name, (html, legacy, current) in pages.items():
+        baseline = time_per_page(legacy, html, args.iterations)
+        print(f"{name:<24}{'legacy bs4 find':<22}{baseline:>10.2f}{'1.00x':>10}")
+        for engine in available_engines():
+            ms = time_per_page(lambda html: current(html, engine), html, args.iterations)
+            print(f"{name:<24}{engine:<22}{ms:>10.2f}{baseline / ms:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''
+Compares assembling a batch of scraped players the previous way (a one-row json_normalize frame with a regex
+replace per player, pd.concat of the frames, then clean_string mapped over every cell) against collecting plain
+records into a ColumnBuffer and cleaning/typing the batch column by column with clean_player_batch.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_player_batch --players 5000
+'''
+import argparse
+import re
+import time
+import pandas as pd
+from pg_scraper_utils.Parser_utils import parse_page
+from pg_scraper_utils.Player_utils import get_player_info, get_stats_table_info, parse_player_page, clean_player_batch, player_columns
+from pg_scraper_utils.Output_utils import ColumnBuffer
+from benchmarks.mock_pg_server import load_fixture
+
+
+def legacy_batch(info, stats, n_players):
+    frames = []
+    for player_id in range(n_players):
+        player_info = dict(info, PlayerID=player_id)
+        player_info.update(stats)
+        frames.append(pd.json_normalize(player_info).replace('\n', ' ', regex=True))
+    df = pd.concat(frames, ignore_index=True)
+    return df.fillna('').apply(lambda col: col.map(lambda s: re.sub(r'^0+\s*', '', str(s).strip())))
+
+
+def record_batch(record, n_players):
+    batch = ColumnBuffer(player_columns)
+    for player_id in range(n_players):
+        batch.append(dict(record, PlayerID=player_id))
+    return clean_player_batch(batch.to_frame())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=2000)
+    args = parser.parse_args()
+
+    html = load_fixture('player_profile.html')
+    page = parse_page(html.decode())
+    info, stats = get_player_info(page), get_stats_table_info(page)
+    record = parse_player_page(html, 0)
+
+    start = time.perf_counter()
+    legacy = legacy_batch(info, stats, args.players)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = record_batch(record, args.players)
+    after = time.perf_counter() - start
+
+    print(f"json_normalize + concat + clean_string: {before * 1000:9.1f} ms ({legacy.shape[1]} columns, all text)")
+    print(f"records + ColumnBuffer + typed cleaning: {after * 1000:8.1f} ms ({current.shape[1]} columns, "
+          f"{sum(current.dtypes != object)} typed) - {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+'''
+Offline benchmark suite for the player, event and rankings scrapers, run against the local mock server
+(benchmarks/mock_pg_server.py) with optional latency, 500 and 429 injection instead of perfectgame.org.
+
+End-to-end benchmarks run scrape_all_players, scrape_data and scrape_rankings_http as a user would. Stage
+benchmarks time fetching, parsing, batch typing and writing on their own, so a regression can be traced to
+a stage. Each benchmark runs in its own process, so the reported peak RSS is that benchmark's own.
+
+Every run reports throughput, p50/p99 latency (per request for network benchmarks, per call for the others)
+and peak RSS. Results are saved as JSON in benchmarks/results, then compared with the previous run or --compare.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --latency 0.02 0.08 --error-rate 0.01 --throttle-rate 0.01 --only players.e2e events.e2e
+    python -m benchmarks.bench_suite --compare benchmarks/results/baseline.json --fail-on-regression
+'''
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+from pg_scraper_utils.Client_utils import create_client
+from pg_scraper_utils.Throttle_utils import AdaptiveLimiter, fetch_with_retry
+from pg_scraper_utils.Scheduler_utils import stream_results
+from pg_scraper_utils.Player_utils import parse_player_page, clean_player_batch, player_columns
+from pg_scraper_utils.Event_utils import parse_event_page, scrape_data
+from pg_scraper_utils.Ranking_utils import parse_rankings_html
+from pg_scraper_utils.Normalize_utils import normalize_events
+from pg_scraper_utils.Output_utils import ColumnBuffer, open_sink
+from benchmarks.mock_pg_server import MockPGServer, load_fixture
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+#metric -> whether a higher value is better, used when comparing runs
+compared_metrics = {'throughput': True, 'p50_ms': False, 'p99_ms': False, 'peak_rss_mb': False}
+
+
+def percentile(values: list, pct: float) -> float:
+    '''Nearest-rank percentile of already sorted values, None when there are none.'''
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+
+def peak_rss_mb() -> float:
+    '''Peak resident set size of this process so far, None where the resource module is unavailable (Windows).'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, kilobytes on Linux
+
+
+def summarize(items: int, elapsed: float, latencies: list, statuses: Counter = None) -> dict:
+    latencies = sorted(latencies)
+    p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+    return {
+        'items': items,
+        'seconds': round(elapsed, 3),
+        'throughput': round(items / elapsed, 1) if elapsed else None,
+        'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+        'p99_ms': round(p99 * 1000, 2) if p99 is not None else None,
+        'statuses': {str(status): count for status, count in sorted((statuses or {}).items())},
+    }
+
+
+class RequestTimer:
+    '''httpx event hooks recording every request's time to response headers and its status.'''
+
+    def __init__(self):
+        self.started = {}
+        self.latencies = []
+        self.statuses = Counter()
+
+    async def on_request(self, request):
+        self.started[request] = time.perf_counter()
+
+    async def on_response(self, response):
+        started = self.started.pop(response.request, None)
+        if started is not None:
+            self.latencies.append(time.perf_counter() - started)
+        self.statuses[response.status_code] += 1
+
+    def client(self, config: dict):
+        client = create_client(base_url=config['base_url'], max_connections=config['threads'], max_keepalive_connections=config['threads'])
+        client.event_hooks = {'request': [self.on_request], 'response': [self.on_response]}
+        return client
+
+
+def timed_calls(func, calls) -> tuple:
+    '''Runs func once per argument tuple, returning the total seconds and each call's seconds.'''
+    latencies = []
+    start = time.perf_counter()
+    for args in calls:
+        call_start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - call_start)
+    return time.perf_counter() - start, latencies
+
+
+def batches(items: list, size: int) -> list:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def player_batches(config: dict) -> list:
+    '''Typed player batches built from the recorded profile, the shape write_stream hands to a sink.'''
+    record = parse_player_page(load_fixture('player_profile.html'), 0)
+    records = [dict(record, PlayerID=player_id) for player_id in range(1, config['players'] + 1)]
+    return [clean_player_batch(pd.DataFrame(batch, columns=player_columns)) for batch in batches(records, config['batch_size'])]
+
+
+#End-to-end benchmarks
+
+async def players_e2e(config: dict) -> dict:
+    from PG_Player_Scraper import scrape_all_players
+    timer = RequestTimer()
+    with tempfile.TemporaryDirectory() as directory:
+        async with timer.client(config) as client:
+            start = time.perf_counter()
+            await scrape_all_players(1, config['players'] + 1, os.path.join(directory, f"players.{config['format']}"), threads=config['threads'],
+                                     retries=config['retries'], client=client, batch_size=config['batch_size'], output_format=config['format'])
+            elapsed = time.perf_counter() - start
+    return summarize(config['players'], elapsed, timer.latencies, timer.statuses)
+
+
+async def events_e2e(config: dict) -> dict:
+    timer = RequestTimer()
+    async with timer.client(config) as client:
+        start = time.perf_counter()
+        await scrape_data(range(1, config['events'] + 1), config['retries'], config['threads'], client=client)
+        elapsed = time.perf_counter() - start
+    return summarize(config['events'], elapsed, timer.latencies, timer.statuses)
+
+
+async def rankings_e2e(config: dict) -> dict:
+    from PG_Rankings_Scraper import scrape_rankings_http
+    timer = RequestTimer()
+    with tempfile.TemporaryDirectory() as directory:
+        async with timer.client(config) as client:
+            start = time.perf_counter()
+            await scrape_rankings_http(2025, config['rankings_pages'], config['format'], config['retries'], client,
+                                       filename=os.path.join(directory, f"rankings.{config['format']}"))
+            elapsed = time.perf_counter() - start
+    return summarize(config['rankings_pages'], elapsed, timer.latencies, timer.statuses)
+
+
+#Stage benchmarks
+
+async def players_fetch(config: dict) -> dict:
+    timer = RequestTimer()
+    limiter = AdaptiveLimiter(maximum=config['threads'])
+    async with timer.client(config) as client:
+        async def fetch(player_id):
+            try:
+                return await fetch_with_retry(client, f'/Players/PlayerProfile.aspx?ID={player_id}', config['retries'], limiter)
+            except Exception:
+                return None
+        start = time.perf_counter()
+        async for _ in stream_results(fetch, range(1, config['players'] + 1), config['threads']):
+            pass
+        elapsed = time.perf_counter() - start
+    return summarize(config['players'], elapsed, timer.latencies, timer.statuses)
+
+
+def players_parse(config: dict) -> dict:
+    html = load_fixture('player_profile.html')
+    elapsed, latencies = timed_calls(parse_player_page, ((html, player_id) for player_id in range(config['parses'])))
+    return summarize(config['parses'], elapsed, latencies)
+
+
+def players_batch(config: dict) -> dict:
+    record = parse_player_page(load_fixture('player_profile.html'), 0)
+
+    def build(player_ids):
+        batch = ColumnBuffer(player_columns)
+        for player_id in player_ids:
+            batch.append(dict(record, PlayerID=player_id))
+        clean_player_batch(batch.to_frame())
+
+    elapsed, latencies = timed_calls(build, ((ids,) for ids in batches(range(1, config['players'] + 1), config['batch_size'])))
+    return summarize(config['players'], elapsed, latencies)
+
+
+def players_write(config: dict) -> dict:
+    typed = player_batches(config)
+    with tempfile.TemporaryDirectory() as directory:
+        sink = open_sink(os.path.join(directory, f"players.{config['format']}"), config['format'], table='players')
+        elapsed, latencies = timed_calls(sink.write, ((batch,) for batch in typed))
+        start = time.perf_counter()
+        sink.close()
+        elapsed += time.perf_counter() - start
+    return summarize(config['players'], elapsed, latencies)
+
+
+def events_parse(config: dict) -> dict:
+    html = load_fixture('workout_results.html')
+    elapsed, latencies = timed_calls(parse_event_page, ((html,) for _ in range(config['parses'])))
+    return summarize(config['parses'], elapsed, latencies)
+
+
+def events_normalize(config: dict) -> dict:
+    table = parse_event_page(load_fixture('workout_results.html'))
+    tables = [pd.concat([table] * len(batch), ignore_index=True) for batch in batches(range(config['events']), config['batch_size'])]
+    elapsed, latencies = timed_calls(normalize_events, ((batch,) for batch in tables))
+    return summarize(config['events'], elapsed, latencies)
+
+
+def rankings_parse(config: dict) -> dict:
+    html = load_fixture('national_rankings.html')
+    elapsed, latencies = timed_calls(parse_rankings_html, ((html,) for _ in range(config['rankings_pages'])))
+    return summarize(config['rankings_pages'], elapsed, latencies)
+
+
+suite = {
+    'players.e2e': players_e2e,
+    'players.fetch': players_fetch,
+    'players.parse': players_parse,
+    'players.batch': players_batch,
+    'players.write': players_write,
+    'events.e2e': events_e2e,
+    'events.parse': events_parse,
+    'events.normalize': events_normalize,
+    'rankings.e2e': rankings_e2e,
+    'rankings.parse': rankings_parse,
+}
+
+
+def run_benchmark(name: str, config: dict) -> dict:
+    '''Runs one benchmark in the current (fresh) process with the scrapers' progress prints hidden.'''
+    benchmark = suite[name]
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(benchmark(config)) if asyncio.iscoroutinefunction(benchmark) else benchmark(config)
+    peak = peak_rss_mb()
+    result['peak_rss_mb'] = round(peak, 1) if peak is not None else None
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latest_results(exclude: str = None) -> str:
+    files = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if path != exclude)
+    return files[-1] if files else None
+
+
+def compare(current: dict, previous: dict, threshold: float) -> list:
+    '''Prints every compared metric next to the previous run's and returns the regressions beyond threshold.'''
+    if current['config'] != previous['config']:
+        print('Note: settings differ from the compared run, differences may not be regressions.')
+    regressions = []
+    print(f"\n{'benchmark':<18}{'metric':<13}{'previous':>11}{'current':>11}{'change':>9}")
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if before is None:
+            continue
+        for metric, higher_is_better in compared_metrics.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = '  REGRESSION' if worse > threshold else ''
+            if flag:
+                regressions.append((name, metric, change))
+            print(f"{name:<18}{metric:<13}{old:>11.1f}{new:>11.1f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(suite), help='benchmarks to run, all of them by default')
+    parser.add_argument('--players', type=int, default=2000, help='player IDs swept, fetched and batched')
+    parser.add_argument('--events', type=int, default=500, help='event IDs swept and event tables normalized')
+    parser.add_argument('--rankings-pages', type=int, default=25, help='rankings pages of 100 players paged through and parsed')
+    parser.add_argument('--parses', type=int, default=500, help='pages parsed by the parse stages')
+    parser.add_argument('--threads', type=int, default=20)
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--format', default='csv', help='output format of the end-to-end and write benchmarks')
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0], help='seconds added to every response, or a low and high range')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After seconds of injected 429s')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file. Defaults to a timestamped file in benchmarks/results')
+    parser.add_argument('--compare', help='results file compared against. Defaults to the latest in benchmarks/results')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change flagged as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exits with status 1 when a regression is flagged')
+    args = parser.parse_args()
+
+    latency = args.latency[0] if len(args.latency) == 1 else args.latency[:2]
+    config = {'players': args.players, 'events': args.events, 'rankings_pages': args.rankings_pages, 'parses': args.parses,
+              'threads': args.threads, 'retries': args.retries, 'batch_size': args.batch_size, 'format': args.format,
+              'latency': latency, 'error_rate': args.error_rate, 'throttle_rate': args.throttle_rate, 'retry_after': args.retry_after,
+              'seed': args.seed}
+    names = args.only or list(suite)
+
+    results = {}
+    print(f"{'benchmark':<18}{'items':>7}{'seconds':>9}{'items/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>8}  injected/statuses")
+    with MockPGServer(rankings_pages=args.rankings_pages, latency=latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                      retry_after=args.retry_after, seed=args.seed) as server:
+        spawn = multiprocessing.get_context('spawn')
+        for name in names:
+            injected_before = dict(server.httpd.injected)
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:  # fresh process per benchmark, own peak RSS
+                result = executor.submit(run_benchmark, name, dict(config, base_url=server.base_url)).result()
+            result['injected'] = {str(status): count - injected_before[status] for status, count in server.httpd.injected.items()}
+            results[name] = result
+            fmt = lambda value, spec: format(value, spec) if value is not None else f"{'-':>{spec.split('.')[0]}}"
+            network = f"injected {result['injected']} statuses {result['statuses']}" if result['statuses'] else ''
+            print(f"{name:<18}{result['items']:>7}{result['seconds']:>9.2f}{fmt(result['throughput'], '10.1f')}{fmt(result['p50_ms'], '9.2f')}"
+                  f"{fmt(result['p99_ms'], '9.2f')}{fmt(result['peak_rss_mb'], '8.1f')}  {network}")
+
+    run = {'created': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(), 'python': platform.python_version(),
+           'platform': platform.platform(), 'config': config, 'results': results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    previous_file = args.compare or latest_results(exclude=os.path.abspath(output))
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults saved to '{output}'")
+
+    if previous_file is None:
+        return
+    with open(previous_file) as f:
+        previous = json.load(f)
+    print(f"Compared with '{previous_file}' (commit {previous.get('commit')}, {previous.get('created')})")
+    regressions = compare(run, previous, args.threshold)
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+Compares the previous WorkoutResults path (pd.read_html on every table of the page plus a second
+BeautifulSoup parse for the showcase labels) against parse_event_page's targeted extraction,
+on a recorded page with results and on one without.
+
+Run from the main_scrapers directory:
+    python -m benchmarks.bench_workout_table --iterations 200
+'''
+import argparse
+import time
+import pandas as pd
+from io import StringIO
+from bs4 import BeautifulSoup
+from pg_scraper_utils.Event_utils import parse_event_page
+from benchmarks.mock_pg_server import load_fixture
+
+
+def legacy_event_page(html):
+    try:
+        tables = pd.read_html(StringIO(html))
+        soup = BeautifulSoup(html, 'html.parser')
+        title = soup.find('a', {'id': 'ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblEventNameNew'})
+        date = soup.find('span', {'id': 'ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblDatesNew'})
+        return tables[4].assign(ShowcaseTitle=title.text if title else 'N/A', ShowcaseDate=date.text if date else 'N/A')
+    except IndexError:
+        return pd.DataFrame()
+
+
+def time_per_page(func, html, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'page':<28}{'legacy ms':>12}{'targeted ms':>14}{'speedup':>10}")
+    for fixture in ('workout_results.html', 'workout_results_empty.html'):
+        html = load_fixture(fixture).decode()
+        legacy = legacy_event_page(html)
+        current = parse_event_page(html).drop(columns='PlayerID', errors='ignore') #the legacy path had no profile links
+        assert legacy.equals(current), f"targeted extraction differs from read_html on {fixture}"
+
+        before = time_per_page(legacy_event_page, html, args.iterations)
+        after = time_per_page(parse_event_page, html, args.iterations)
+        print(f"{fixture:<28}{before:>12.3f}{after:>14.3f}{before / after:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+routes = {
+    '/Players/PlayerProfile.aspx': 'player_profile.html',
+    '/events/Showcases/WorkoutResults.aspx': 'workout_results.html',
+}
+
+rankings_path = '/Rankings/Players/NationalRankings.aspx'
+rankings_fixture = 'national_rankings.html'
+rankings_target = 'ctl00$ContentTopLevel$ContentPlaceHolder1$gvPlayers'
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def pager_link(argument: str, text: str) -> str:
+    return (f'<td><a href="javascript:__doPostBack(&#39;{rankings_target}&#39;,&#39;Page${argument}&#39;)">{text}</a></td>')
+
+
+def rankings_page(template: str, page: int, total_pages: int) -> str:
+    '''
+    Renders rankings page `page` from the recorded first page: ranks and player IDs are offset by page, and the
+    pager shows the page's window of 10 like the site does. __EVENTVALIDATION lists the pages the pager links to,
+    so a postback for a page that isn't linked from the posted state is rejected.
+    '''
+    offset = (page - 1) * 100
+    html = re.sub(r'(lblNatRank_\d+">)(\d+)<', lambda m: f'{m.group(1)}{int(m.group(2)) + offset}<', template)
+    html = re.sub(r'(PlayerProfile\.aspx\?ID=)(\d+)', lambda m: f'{m.group(1)}{int(m.group(2)) + offset}', html)
+
+    start = (page - 1) // 10 * 10 + 1
+    end = min(start + 9, total_pages)
+    cells, linked = [], []
+    if start > 1:
+        cells += [pager_link('First', '&lt; First'), pager_link(start - 1, '...')]
+        linked += [1, start - 1]
+    for number in range(start, end + 1):
+        if number == page:
+            cells.append(f'<td><span>{number}</span></td>')
+        else:
+            cells.append(pager_link(number, number))
+            linked.append(number)
+    if end < total_pages:
+        cells += [pager_link(end + 1, '...'), pager_link('Last', 'Last &gt;')]
+        linked += [end + 1, total_pages]
+    html = re.sub(r'(<tr class="pagingnavy">\s*<td colspan="10"><table><tr>\s*).*?(\s*</tr></table>)',
+                  lambda m: m.group(1) + ''.join(cells) + m.group(2), html, flags=re.S)
+    validation = 'pages:' + ','.join(str(number) for number in sorted(set(linked)))
+    return re.sub(r'(id="__EVENTVALIDATION" value=")[^"]*', lambda m: m.group(1) + validation, html)
+
+
+class MockPGHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keeps connections open so pooled clients can reuse them
+
+    def send_page(self, body: bytes, status: int = 200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject_faults(self) -> bool:
+        '''Delays the response by the configured latency, then answers with an injected 500 or 429 when one is drawn.'''
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            delay = server.latency if not isinstance(server.latency, tuple) else server.random.uniform(*server.latency)
+            draw = server.random.random()
+        if delay:
+            time.sleep(delay)
+        if draw < server.error_rate:
+            fault = 500
+        elif draw < server.error_rate + server.throttle_rate:
+            fault = 429
+        else:
+            return False
+        with server.lock:
+            server.injected[fault] += 1
+        body = b'Too Many Requests' if fault == 429 else b'Internal Server Error'
+        self.send_response(fault)
+        if fault == 429:
+            self.send_header('Retry-After', str(server.retry_after))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_POST(self):
+        '''ASP.NET postback paging for the rankings grid.'''
+        if self.path.split('?')[0] != rankings_path:
+            self.send_error(404)
+            return
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode())  # read first, the connection is reused
+        if self.inject_faults():
+            return
+        argument = form.get('__EVENTARGUMENT', [''])[0]
+        validation = form.get('__EVENTVALIDATION', [''])[0]
+        allowed = validation.split(':', 1)[1].split(',') if validation.startswith('pages:') else []
+        total_pages = self.server.rankings_pages
+        number = total_pages if argument == 'Page$Last' else 1 if argument == 'Page$First' else argument.replace('Page$', '')
+        if form.get('__EVENTTARGET', [''])[0] != rankings_target or str(number) not in allowed or '__VIEWSTATE' not in form:
+            self.send_page(b'Invalid postback or callback argument', 500)
+            return
+        self.send_page(rankings_page(self.server.rankings_template, int(number), total_pages).encode())
+
+    def do_GET(self):
+        if self.path.split('?')[0] == rankings_path:
+            if self.inject_faults():
+                return
+            self.send_page(rankings_page(self.server.rankings_template, 1, self.server.rankings_pages).encode())
+            return
+        fixture = routes.get(self.path.split('?')[0])
+        if fixture is None:
+            self.send_error(404)
+            return
+        if self.inject_faults():
+            return
+        body = self.server.pages[fixture]
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # silences per-request logging
+        pass
+
+
+class MockPGServer:
+    """
+    Local stand-in for perfectgame.org serving recorded fixture pages, run on a background thread.
+    Responses can be slowed down and made to fail, to see how the scrapers behave against a slow or throttling site.
+
+    Args:
+        host (str): interface the server listens on
+        port (int): port the server listens on, 0 picks a free one
+        rankings_pages (int): pages of 100 players the rankings grid pages through
+        latency (float or tuple): seconds every response is delayed, or a (low, high) range drawn from per request
+        error_rate (float): share of requests answered with a 500
+        throttle_rate (float): share of requests answered with a 429 and a Retry-After header
+        retry_after (float): seconds sent in the Retry-After header of injected 429s
+        seed (int, optional): seed of the fault and latency draws, so runs inject the same faults
+
+    Usage:
+        with MockPGServer(latency=(0.02, 0.08), throttle_rate=0.01) as server:
+            client = create_client(base_url=server.base_url)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, rankings_pages: int = 25, latency=0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 1, seed: int = None):
+        self.httpd = ThreadingHTTPServer((host, port), MockPGHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.pages = {name: load_fixture(name) for name in set(routes.values())}
+        self.httpd.rankings_template = load_fixture(rankings_fixture).decode()
+        self.httpd.rankings_pages = rankings_pages  # pages of 100 players the rankings grid pages through
+        self.httpd.requests = 0  # requests that reached the server, ex. to check how many a cache saved
+        self.httpd.latency = tuple(latency) if isinstance(latency, (list, tuple)) else latency
+        self.httpd.error_rate = error_rate
+        self.httpd.throttle_rate = throttle_rate
+        self.httpd.retry_after = retry_after
+        self.httpd.injected = {500: 0, 429: 0}  # faults sent, by status
+        self.httpd.random = random.Random(seed)
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+import httpx
+from collections import namedtuple
+from pg_scraper_utils.Throttle_utils import fetch_with_retry
+
+CacheEntry = namedtuple('CacheEntry', ['url', 'digest', 'encoding', 'etag', 'last_modified', 'fetched_at', 'immutable'])
+
+
+class ResponseCache:
+    """
+    On-disk cache of fetched pages, keyed by URL, with compressed bodies stored by content hash.
+
+    Bodies are zlib-compressed and named by their sha256, so identical pages (ex. the many empty event pages)
+    are stored once. An SQLite index maps each URL to its body along with the ETag/Last-Modified validators
+    the server sent. Entries younger than `ttl` are served without a request. Older ones are revalidated with a
+    conditional request when validators exist, and entries marked immutable (ex. finished events) never expire.
+    The least recently used entries are evicted once the bodies exceed `max_bytes`.
+
+    Args:
+        directory (str): cache directory, created if it doesn't exist
+        ttl (float): seconds an entry is served without revalidation
+        max_bytes (int): size budget for compressed bodies
+        compression (int): zlib level used for bodies
+    """
+
+    def __init__(self, directory: str, ttl: float = 86400.0, max_bytes: int = 2 * 1024 ** 3, compression: int = 6):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.compression = compression
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'))
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS entries (
+                               url TEXT PRIMARY KEY, digest TEXT NOT NULL, encoding TEXT, etag TEXT, last_modified TEXT,
+                               fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, immutable INTEGER NOT NULL DEFAULT 0)''')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, size INTEGER NOT NULL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)')
+        self.db.commit()
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+        self.hits = self.revalidated = self.misses = 0
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def lookup(self, url: str) -> CacheEntry:
+        row = self.db.execute('SELECT url, digest, encoding, etag, last_modified, fetched_at, immutable FROM entries WHERE url = ?',
+                              (url,)).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return bool(entry.immutable) or time.time() - entry.fetched_at < self.ttl
+
+    def read(self, entry: CacheEntry) -> bytes:
+        '''Returns the entry's body and marks it recently used, None if the body has gone missing.'''
+        try:
+            with open(self.object_path(entry.digest), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            self.db.execute('DELETE FROM entries WHERE url = ?', (entry.url,))
+            self.db.commit()
+            return None
+        self.db.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (time.time(), entry.url))
+        self.db.commit()
+        return body
+
+    def store(self, url: str, body: bytes, encoding: str = None, etag: str = None, last_modified: str = None, immutable: bool = False) -> None:
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(body, self.compression)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(compressed)
+            os.replace(path + '.tmp', path)
+            self.db.execute('INSERT OR REPLACE INTO objects (digest, size) VALUES (?, ?)', (digest, len(compressed)))
+            self.total_bytes += len(compressed)
+        now = time.time()
+        self.db.execute('''INSERT INTO entries (url, digest, encoding, etag, last_modified, fetched_at, accessed_at, immutable)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(url) DO UPDATE SET digest = excluded.digest, encoding = excluded.encoding, etag = excluded.etag,
+                               last_modified = excluded.last_modified, fetched_at = excluded.fetched_at,
+                               accessed_at = excluded.accessed_at, immutable = MAX(entries.immutable, excluded.immutable)''',
+                        (url, digest, encoding, etag, last_modified, now, now, int(immutable)))
+        self.db.commit()
+        self.evict()
+
+    def touch(self, url: str) -> None:
+        '''Restarts an entry's ttl after the server confirmed (304) it is unchanged.'''
+        now = time.time()
+        self.db.execute('UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+        self.db.commit()
+
+    def mark_immutable(self, url: str) -> None:
+        self.db.execute('UPDATE entries SET immutable = 1 WHERE url = ?', (url,))
+        self.db.commit()
+
+    def evict(self) -> None:
+        '''Drops least recently used entries, and bodies no entry points to anymore, until under 90% of max_bytes.'''
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9  # leaves headroom so the next stores don't evict again straight away
+        for url, digest in self.db.execute('SELECT url, digest FROM entries ORDER BY accessed_at').fetchall():
+            self.db.execute('DELETE FROM entries WHERE url = ?', (url,))
+            if self.db.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone() is None:
+                size = self.db.execute('SELECT size FROM objects WHERE digest = ?', (digest,)).fetchone()
+                self.db.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+                try:
+                    os.remove(self.object_path(digest))
+                except OSError:
+                    pass
+                self.total_bytes -= size[0] if size else 0
+            if self.total_bytes <= target:
+                break
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
+
+
+async def cached_fetch(client: httpx.AsyncClient, url: str, retries: int, limiter=None, cache: ResponseCache = None, metrics=None) -> httpx.Response:
+    """
+    Fetches a page through the response cache: fresh entries are served from disk, stale entries with validators are
+    revalidated with a conditional request (a 304 serves the stored body), everything else is fetched and stored.
+
+    Args:
+        client (httpx.AsyncClient): shared client
+        url (str): page being fetched, relative to the client's base_url
+        retries (int): total attempts allowed for a request that has to go to the site
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller
+        cache (ResponseCache, optional): response cache. Without one this is a plain fetch_with_retry.
+        metrics (ScrapeMetrics, optional): run metrics of the requests that go to the site
+
+    Returns:
+        httpx.Response: the live response, or one rebuilt from the cached body.
+    """
+    if cache is None:
+        return await fetch_with_retry(client, url, retries, limiter, metrics=metrics)
+
+    key = str(client.base_url.join(url))
+    entry = cache.lookup(key)
+    body = cache.read(entry) if entry else None
+    if body is not None and cache.is_fresh(entry):
+        cache.hits += 1
+        return cached_response(key, body, entry.encoding)
+
+    headers = {}
+    if body is not None and entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if body is not None and entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+
+    response = await fetch_with_retry(client, url, retries, limiter, headers=headers or None, metrics=metrics)
+    if response.status_code == 304 and body is not None:
+        cache.revalidated += 1
+        cache.touch(key)
+        return cached_response(key, body, entry.encoding)
+
+    cache.misses += 1
+    if response.status_code == 200:
+        cache.store(key, response.content, response.encoding, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return response
+
+
+def cached_response(url: str, body: bytes, encoding: str = None) -> httpx.Response:
+    return httpx.Response(200, content=body, headers={'Content-Type': f'text/html; charset={encoding or "utf-8"}'},
+                          request=httpx.Request('GET', url))
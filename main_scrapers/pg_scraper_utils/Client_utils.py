@@ -0,0 +1,47 @@
+import httpx
+from contextlib import asynccontextmanager
+
+PG_BASE_URL = 'https://www.perfectgame.org'
+
+
+def http2_available() -> bool:
+    '''Returns True when the optional h2 package is installed, which httpx needs for HTTP/2.'''
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_client(max_connections: int = 100, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0,
+                  http2: bool = True, timeout: float = 10.0, base_url: str = PG_BASE_URL) -> httpx.AsyncClient:
+    """
+    Creates one long-lived httpx client meant to be shared by every request of a scrape run, so connections
+    (and their TCP/TLS handshakes) are pooled and reused instead of being rebuilt for every ID.
+
+    Args:
+        max_connections (int): maximum number of open connections in the pool
+        max_keepalive_connections (int): maximum number of idle connections kept alive for reuse
+        keepalive_expiry (float): seconds an idle connection is kept before being closed
+        http2 (bool): uses HTTP/2 when the h2 package is installed, falls back to HTTP/1.1 otherwise
+        timeout (float): request timeout in seconds
+        base_url (str): site root that the relative page paths used by the scrapers are resolved against
+
+    Returns:
+        httpx.AsyncClient: A configured client. Caller is responsible for closing it (or using it as a context manager).
+    """
+    limits = httpx.Limits(max_connections=max_connections,
+                          max_keepalive_connections=min(max_keepalive_connections, max_connections),
+                          keepalive_expiry=keepalive_expiry)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout,
+                             http2=http2 and http2_available())
+
+
+@asynccontextmanager
+async def shared_client(client: httpx.AsyncClient = None, **client_kwargs):
+    '''Yields the given client untouched, or creates (and closes on exit) a new one from create_client.'''
+    if client is not None:
+        yield client
+        return
+    async with create_client(**client_kwargs) as new_client:
+        yield new_client
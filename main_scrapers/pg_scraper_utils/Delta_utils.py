@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+import pandas as pd
+from pg_scraper_utils.Output_utils import open_sink
+from pg_scraper_utils.Normalize_utils import null_values
+from pg_scraper_utils.Store_utils import PGStore
+from pg_scraper_utils.Metrics_utils import logger
+
+
+def row_fingerprints(df: pd.DataFrame) -> list:
+    '''
+    64-bit fingerprint of every row's non-missing fields. Missing fields are left out, so a row hashes the same
+    whichever other players (and therefore columns) shared its batch.
+    '''
+    fingerprints = []
+    for record in df.to_dict('records'):
+        fields = {str(col): str(value) for col, value in record.items() if not pd.isna(value) and str(value).strip() not in null_values}
+        digest = hashlib.blake2b(json.dumps(fields, sort_keys=True).encode(), digest_size=8).digest()
+        fingerprints.append(int.from_bytes(digest, 'big', signed=True))  # fits an SQLite INTEGER
+    return fingerprints
+
+
+class FingerprintStore:
+    """
+    Compact per-player record of the last scraped profile: a 64-bit fingerprint of its fields, when it last changed
+    and when it was last seen. About 30 bytes per player in an SQLite file, so a full ID range fits in a few hundred MB.
+
+    Args:
+        filename (str): SQLite file, created if it doesn't exist (ex. 'pg_players.fingerprints')
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.db = sqlite3.connect(filename)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS fingerprints (
+                               player_id INTEGER PRIMARY KEY, digest INTEGER NOT NULL, changed_at REAL NOT NULL, seen_at REAL NOT NULL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS fingerprints_changed ON fingerprints (changed_at)')
+        self.db.commit()
+
+    def __len__(self) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+    def lookup(self, player_ids: list) -> dict:
+        '''Stored fingerprint of each given player that has one.'''
+        found = {}
+        for i in range(0, len(player_ids), 500):  # stays under SQLite's bound parameter limit
+            chunk = player_ids[i:i + 500]
+            query = f"SELECT player_id, digest FROM fingerprints WHERE player_id IN ({','.join('?' * len(chunk))})"
+            found.update(self.db.execute(query, chunk).fetchall())
+        return found
+
+    def record(self, player_ids: list, digests: list, changed: list) -> None:
+        '''Stores the latest fingerprints, moving changed_at forward only for players whose fingerprint changed.'''
+        now = time.time()
+        self.db.executemany('''INSERT INTO fingerprints (player_id, digest, changed_at, seen_at) VALUES (?, ?, ?, ?)
+                               ON CONFLICT(player_id) DO UPDATE SET digest = excluded.digest, seen_at = excluded.seen_at,
+                                   changed_at = CASE WHEN ? THEN excluded.changed_at ELSE fingerprints.changed_at END''',
+                            [(player_id, digest, now, now, int(is_changed)) for player_id, digest, is_changed in zip(player_ids, digests, changed)])
+        self.db.commit()
+
+    def prioritize(self, player_ids, recent_days: float = 30.0):
+        '''
+        Lazily reorders an ID range so players whose profile changed within recent_days come first (most recent first),
+        followed by every other ID in its original order. Active players are then refreshed even if a run is cut short.
+        '''
+        player_ids = player_ids if isinstance(player_ids, range) else list(player_ids)
+        members = player_ids if isinstance(player_ids, range) else set(player_ids)  # ranges test membership without a set
+        since = time.time() - recent_days * 86400
+        recent = [player_id for (player_id,) in self.db.execute('SELECT player_id FROM fingerprints WHERE changed_at >= ? ORDER BY changed_at DESC', (since,))
+                  if player_id in members]
+        recent_set = set(recent)
+        yield from recent
+        yield from (player_id for player_id in player_ids if player_id not in recent_set)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class DeltaSink:
+    """
+    Wraps an output sink so only new or changed player rows are written to it, judged against a FingerprintStore.
+
+    Each batch is fingerprinted and compared with the store, changed rows are written to the wrapped sink, and only
+    then are the new fingerprints stored. A crash in between can repeat a change on the next run but never lose one.
+
+    Args:
+        sink: output sink receiving the changed rows (see Output_utils.open_sink)
+        store (FingerprintStore): fingerprints from earlier runs
+        key (str): column identifying the player
+    """
+
+    def __init__(self, sink, store: FingerprintStore, key: str = 'PlayerID'):
+        self.sink = sink
+        self.store = store
+        self.key = key
+        self.new = self.changed = self.unchanged = 0
+
+    @property
+    def rows_written(self) -> int:
+        return self.sink.rows_written
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        player_ids = [int(float(player_id)) for player_id in df[self.key]]
+        digests = row_fingerprints(df)
+        known = self.store.lookup(player_ids)
+        changed = [known.get(player_id) != digest for player_id, digest in zip(player_ids, digests)]
+
+        new = sum(1 for player_id in player_ids if player_id not in known)
+        self.new += new
+        self.changed += sum(changed) - new
+        self.unchanged += len(changed) - sum(changed)
+
+        self.sink.write(df[changed])
+        self.store.record(player_ids, digests, changed)
+
+    def close(self) -> None:
+        self.sink.close()
+
+    def counts(self) -> dict:
+        return {'new': self.new, 'changed': self.changed, 'unchanged': self.unchanged}
+
+
+def read_output(filename: str, output_format: str = 'csv', table: str = 'players') -> pd.DataFrame:
+    '''Reads a CSV file, Parquet dataset or store table written by a sink back into a DataFrame, empty if it doesn't exist.'''
+    if not os.path.exists(filename) or (output_format == 'csv' and os.path.getsize(filename) == 0):
+        return pd.DataFrame()
+    if output_format == 'csv':
+        return pd.read_csv(filename, dtype=str, keep_default_na=False)
+    if output_format == 'sqlite':
+        store = PGStore(filename)
+        try:
+            return store.query(f'SELECT * FROM {table}') if store.table_columns(table) else pd.DataFrame()
+        finally:
+            store.close()
+    return pd.read_parquet(filename)
+
+
+def merge_snapshot(snapshot_filename: str, changes_filename: str, output_format: str = 'csv', key: str = 'PlayerID') -> int:
+    """
+    Applies a changes-only dataset to the full snapshot: changed players' rows are replaced, new players are added.
+    A CSV or Parquet snapshot is written next to the old one and swapped in, so it is never half written. A 'sqlite'
+    snapshot gets the changes upserted into its players table in one transaction, leaving its other tables alone.
+
+    Args:
+        snapshot_filename (str): full snapshot of every player, created on the first run
+        changes_filename (str): changes-only output of a delta run
+        output_format (str): 'csv', 'parquet' or 'sqlite', the format of both files
+        key (str): column identifying the player
+
+    Returns:
+        int: rows in the updated snapshot.
+    """
+    recover_snapshot(snapshot_filename)
+    changes = read_output(changes_filename, output_format)
+    if output_format == 'sqlite': #the database may hold events and rankings too, so it is updated in place rather than rebuilt
+        store = PGStore(snapshot_filename)
+        try:
+            store.upsert('players', changes)
+            return store.db.execute('SELECT COUNT(*) FROM players').fetchone()[0] if store.table_columns('players') else 0
+        finally:
+            store.close()
+
+    snapshot = read_output(snapshot_filename, output_format)
+    if changes.empty:
+        return len(snapshot)
+    if not snapshot.empty:
+        changed_ids = set(pd.to_numeric(changes[key], errors='coerce'))
+        snapshot = snapshot[~pd.to_numeric(snapshot[key], errors='coerce').isin(changed_ids)]
+    merged = pd.concat([snapshot, changes], ignore_index=True)
+    merged = merged.iloc[pd.to_numeric(merged[key], errors='coerce').argsort(kind='stable')]
+
+    staging = f'{snapshot_filename}.tmp'
+    sink = open_sink(staging, output_format)
+    sink.write(merged)
+    sink.close()
+    if os.path.isdir(staging): #directories can't be swapped in one step, the old snapshot is kept as a backup until the new one is in place
+        backup = f'{snapshot_filename}.bak'
+        if os.path.isdir(snapshot_filename):
+            if os.path.isdir(backup):
+                shutil.rmtree(backup)
+            os.rename(snapshot_filename, backup)
+        os.rename(staging, snapshot_filename)
+        if os.path.isdir(backup):
+            shutil.rmtree(backup)
+    else:
+        os.replace(staging, snapshot_filename)
+    return len(merged)
+
+
+def recover_snapshot(snapshot_filename: str) -> None:
+    '''Puts back the backup of a Parquet snapshot whose swap was interrupted between moving the old one aside and the new one in.'''
+    backup = f'{snapshot_filename}.bak'
+    if os.path.isdir(backup) and not os.path.exists(snapshot_filename):
+        logger.warning(f"Restoring '{snapshot_filename}' from the backup left by an interrupted merge")
+        os.rename(backup, snapshot_filename)
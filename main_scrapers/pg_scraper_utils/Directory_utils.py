@@ -0,0 +1,265 @@
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+player_ids_file = "Perfect-Game-Baseball-Scraper/resource_files/perfect_game_player_ids.csv"
+
+
+def normalize_name(name) -> str:
+    '''Lowercases and strips accents and punctuation, ex. "José O'Neil-Smith" -> "jose oneil smith".'''
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    text = re.sub(r"['.]", '', text)
+    return ' '.join(re.split(r'[^a-z0-9]+', text)).strip()
+
+
+def position_tokens(position) -> list:
+    '''Splits a position combo such as "RHP/SS" or "C, 1B" into its positions.'''
+    return [token for token in re.split(r'[^A-Z0-9]+', str(position).upper()) if token and token != 'NAN']
+
+
+def year_key(value) -> str:
+    '''Whole-number key for ages and graduation years, so 18, "18" and "18.4" all index as "18".'''
+    match = re.match(r'\s*(\d+)', str(value))
+    return match.group(1) if match else None
+
+
+def deletions(token: str) -> set:
+    '''The token and every string one deleted character away from it, the keys of the typo index.'''
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def name_similarity(query: str, name: str, floor: float = 0.0) -> float:
+    '''
+    0-1 similarity of two normalized names, forgiving typos and swapped word order ("smith john" vs "john smith").
+    Names whose letters alone can't reach `floor` get 0 without the full comparison.
+    '''
+    if not query or not name:
+        return 0.0
+    matcher = SequenceMatcher(None, query, name)
+    if matcher.quick_ratio() < floor: #upper bound of both ratios below, word order doesn't change the letters
+        return 0.0
+    ordered = matcher.ratio()
+    unordered = SequenceMatcher(None, ' '.join(sorted(query.split())), ' '.join(sorted(name.split()))).ratio()
+    return max(ordered, unordered)
+
+
+#confidence added when a row agrees with a hint, and taken off when it has a different value (rows without the value are left alone)
+hint_weights = {'graduation_year': (0.05, 0.25), 'position': (0.03, 0.1)}
+
+
+class PlayerDirectory:
+    """
+    In-memory player ID directory built once from the player ID file, with prebuilt indexes for lookups.
+
+    Names are indexed by normalized token (token -> set of rows), with a sorted token list so partially typed words
+    match by prefix. Age, Position and HSGrad each get a bitmap (boolean mask over rows) per value, so combined
+    filters are answered by AND-ing masks. The directory is read-only once built and safe to share between requests.
+
+    Args:
+        df (pd.DataFrame): player ID info with PlayerID and PlayerName columns, and optionally Age, Position and HSGrad
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.size = len(self.df)
+        self.ids = self.df['PlayerID'].tolist()
+        self.names = self.df['PlayerName'].fillna('').astype(str).tolist()
+        self.normalized = [normalize_name(name) for name in self.names]
+
+        self.name_index = {}
+        for row, name in enumerate(self.normalized):
+            for token in name.split():
+                self.name_index.setdefault(token, set()).add(row)
+        self.tokens = sorted(self.name_index)
+
+        #every normalized name on its own line, so a mid-word query ("son" in "jackson") is one str.find scan
+        self.corpus = '\n'.join(self.normalized) + '\n'
+        self.offsets = np.cumsum([0] + [len(name) + 1 for name in self.normalized]).tolist()
+        self.typo_index = None #built on the first fuzzy match, plain searches never need it
+
+        self.age_index = self.build_bitmaps('Age', lambda value: [year_key(value)])
+        self.position_index = self.build_bitmaps('Position', position_tokens)
+        self.grad_index = self.build_bitmaps('HSGrad', lambda value: [year_key(value)])
+
+    @classmethod
+    def from_csv(cls, path: str = player_ids_file) -> 'PlayerDirectory':
+        return cls(pd.read_csv(path))
+
+    def build_bitmaps(self, column: str, keys_of) -> dict:
+        bitmaps = {}
+        if column not in self.df.columns:
+            return bitmaps
+        for row, value in enumerate(self.df[column].tolist()):
+            for key in keys_of(value):
+                if key is None:
+                    continue
+                if key not in bitmaps:
+                    bitmaps[key] = np.zeros(self.size, dtype=bool)
+                bitmaps[key][row] = True
+        return bitmaps
+
+    def token_rows(self, token: str) -> set:
+        '''Rows with a name token equal to, or else starting with, the given token.'''
+        if token in self.name_index:
+            return self.name_index[token]
+        rows = set()
+        for i in range(bisect_left(self.tokens, token), len(self.tokens)):
+            if not self.tokens[i].startswith(token):
+                break
+            rows |= self.name_index[self.tokens[i]]
+        return rows
+
+    def similar_tokens(self, token: str) -> set:
+        '''Indexed tokens one typo (insert, delete, swap or substitution) away from the token, itself included if indexed.'''
+        if self.typo_index is None:
+            self.typo_index = {}
+            for indexed in self.tokens:
+                for key in deletions(indexed):
+                    self.typo_index.setdefault(key, set()).add(indexed)
+        found = set()
+        for key in deletions(token):
+            found |= self.typo_index.get(key, set())
+        return found
+
+    def candidate_rows(self, tokens: list, max_rows: int = 5000) -> set:
+        '''
+        Rows sharing at least one word with the query, allowing a typo in words of 4+ letters and a prefix for the rest.
+        Words matching more than max_rows players (ex. a common first name) are skipped unless no rarer word matches.
+        '''
+        per_token = []
+        for token in tokens:
+            rows = set(self.token_rows(token))
+            if len(token) >= 4:
+                for similar in self.similar_tokens(token):
+                    rows |= self.name_index[similar]
+            per_token.append(rows)
+        rare = [rows for rows in per_token if len(rows) <= max_rows]
+        if rare:
+            return set().union(*rare)
+        return min(per_token, key=len, default=set())
+
+    def name_rows(self, name: str) -> set:
+        '''Rows whose name contains every word of the query (whole word, or word prefix for partially typed words).'''
+        tokens = sorted(normalize_name(name).split(), key=lambda token: len(self.name_index.get(token, ())))
+        if not tokens:
+            return set()
+        rows = None
+        for token in tokens:
+            rows = self.token_rows(token) if rows is None else rows & self.token_rows(token)
+            if not rows:
+                return set()
+        return rows
+
+    def substring_rows(self, name: str) -> set:
+        '''Rows whose normalized name contains the normalized query anywhere, as the old str.contains lookup matched.'''
+        query = normalize_name(name)
+        rows = set()
+        if not query:
+            return rows
+        position = self.corpus.find(query)
+        while position != -1:
+            row = bisect_right(self.offsets, position) - 1
+            rows.add(row)
+            position = self.corpus.find(query, self.offsets[row + 1])
+        return rows
+
+    def filter_mask(self, age=None, position=None, graduation_year=None) -> np.ndarray:
+        '''Boolean mask of rows meeting every given filter, None when no filter is given.'''
+        masks = []
+        if age is not None:
+            masks.append(self.age_index.get(year_key(age)))
+        if position is not None:
+            masks.append(self.position_index.get(str(position).strip().upper()))
+        if graduation_year is not None:
+            masks.append(self.grad_index.get(year_key(graduation_year)))
+        if not masks:
+            return None
+        if any(mask is None for mask in masks):
+            return np.zeros(self.size, dtype=bool)
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+
+    def search(self, name: str = None, age=None, position=None, graduation_year=None, limit: int = None) -> list:
+        """
+        Looks players up by any combination of name and filters.
+
+        A name matches when every word of the query starts a word of the player's name, in any order ("smi jo" finds
+        "John Smith"), or when the query appears anywhere in the name ("son" finds "Jackson"), as a plain substring
+        lookup would.
+
+        Args:
+            name (str, optional): full or partial player name, case and accent insensitive
+            age (int, optional): age rounded down to the year (ex. 18)
+            position (str, optional): a single position (ex. C, 1B, RHP), matches any combo containing it
+            graduation_year (int, optional): full year of graduation (ex. 2024)
+            limit (int, optional): maximum amount of matches returned
+
+        Returns:
+            list: dicts of PlayerName and PlayerID for matching players, in directory order.
+        """
+        mask = self.filter_mask(age, position, graduation_year)
+        if name is not None:
+            rows = sorted(self.name_rows(name) | self.substring_rows(name))
+            if mask is not None:
+                rows = [row for row in rows if mask[row]]
+        elif mask is not None:
+            rows = np.flatnonzero(mask)[:limit].tolist()
+        else:
+            rows = range(self.size)
+        return [{'PlayerName': self.names[row], 'PlayerID': self.ids[row]} for row in list(rows)[:limit]]
+
+    def hint_value(self, index: dict, keys: list, row: int):
+        '''Whether the row has any of the hinted values, None when the row has no value for that column.'''
+        if not keys or not index:
+            return None
+        if any(index[key][row] for key in keys if key in index):
+            return True
+        return False if any(bitmap[row] for bitmap in index.values()) else None
+
+    def match(self, name: str, graduation_year=None, position=None, limit: int = 5, min_confidence: float = 0.5) -> list:
+        """
+        Fuzzy name lookup with ranked candidates, for names typed by hand (typos, nicknames cut short, swapped word order,
+        missing accents). Every candidate gets a 0-1 confidence from its name similarity, raised when it agrees with the
+        grad year or position hints and lowered when it contradicts them.
+
+        Args:
+            name (str): player name as written in the source list
+            graduation_year (int, optional): expected graduation year (ex. 2024)
+            position (str, optional): expected position (ex. RHP), matches any combo containing it
+            limit (int): maximum amount of candidates returned
+            min_confidence (float): candidates below this confidence are left out
+
+        Returns:
+            list: dicts of PlayerName, PlayerID and Confidence, best match first.
+        """
+        query = normalize_name(name)
+        tokens = query.split()
+        if not tokens:
+            return []
+        hints = {'graduation_year': (self.grad_index, [key for key in [year_key(graduation_year)] if key is not None]),
+                 'position': (self.position_index, position_tokens(position) if position is not None else [])}
+
+        floor = min_confidence - sum(bonus for bonus, _ in hint_weights.values()) #best a name can be lifted by agreeing hints
+        scored = []
+        for row in self.candidate_rows(tokens):
+            confidence = name_similarity(query, self.normalized[row], floor)
+            for hint, (index, keys) in hints.items():
+                agrees = self.hint_value(index, keys, row)
+                if agrees is not None:
+                    bonus, penalty = hint_weights[hint]
+                    confidence += bonus if agrees else -penalty
+            confidence = min(1.0, max(0.0, confidence))
+            if confidence >= min_confidence:
+                scored.append((confidence, row))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [{'PlayerName': self.names[row], 'PlayerID': self.ids[row], 'Confidence': round(confidence, 3)} for confidence, row in scored[:limit]]
+
+
+@lru_cache(maxsize=None)
+def load_player_directory(path: str = player_ids_file) -> PlayerDirectory:
+    '''Loads and indexes the player ID file once per process, later calls return the same directory.'''
+    return PlayerDirectory.from_csv(path)
@@ -3,63 +3,156 @@ import httpx
 from bs4 import BeautifulSoup
 import pandas as pd
 import nest_asyncio
+import re
 from io import StringIO
+from datetime import datetime, timedelta
+from contextlib import nullcontext
+from pg_scraper_utils.Client_utils import shared_client
+from pg_scraper_utils.Parser_utils import parse_page, node_text, decode, run_parse
+from pg_scraper_utils.Scheduler_utils import stream_results
+from pg_scraper_utils.Throttle_utils import AdaptiveLimiter
+from pg_scraper_utils.Cache_utils import cached_fetch
+from pg_scraper_utils.Normalize_utils import normalize_events
+from pg_scraper_utils.Metrics_utils import logger, maybe_stage, failure_reason
 
 
-# Function to parse showcase labels from HTML on site
-async def get_showcase_info(html):
+# Function to parse showcase labels from a parsed page (see Parser_utils.parse_page)
+def get_showcase_info(page):
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        title_element = soup.find("a", {"id": "ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblEventNameNew"})
-        date_element = soup.find("span", {"id": "ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblDatesNew"})
-
-        title = title_element.text if title_element else "N/A"
-        date = date_element.text if date_element else "N/A"
+        title = node_text(page, "ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblEventNameNew")
+        date = node_text(page, "ContentTopLevel_ContentPlaceHolder1_EventHeader1_lblDatesNew")
 
         return title, date
     except Exception as e:
-        print(f"Error in get_showcase_info: {e}")
+        logger.warning(f"Error in get_showcase_info: {e}")
         return "N/A", "N/A"
 
+workout_table_id = 'ContentTopLevel_ContentPlaceHolder1_gvWorkoutResults'
+
+#header cells of the workout results table, a table whose header has Name and a few of these is the results table
+workout_columns = {'Name', 'Pos', 'Grad', 'Ht', 'Wt', '60', '10', 'FB', 'OF', 'IF', 'Pop', 'Exit Velo'}
+
+#player names in the workout table link to their profiles, ex. /Players/Playerprofile.aspx?ID=123456
+player_link_pattern = re.compile(r'Playerprofile\.aspx\?ID=(\d+)', re.IGNORECASE)
+table_row_pattern = re.compile(r'<tr\b.*?</tr>', re.IGNORECASE | re.DOTALL)
+header_cell_pattern = re.compile(r'<th\b[^>]*>(.*?)</th>', re.IGNORECASE | re.DOTALL)
+name_header_pattern = re.compile(r'<th\b[^>]*>\s*(?:<[^>]+>\s*)*Name\s*<', re.IGNORECASE)
+
+# Function to cheaply tell whether a page can hold workout results without parsing it - the same signs is_workout_table looks for
+def has_workout_table(html):
+    return workout_table_id in html or player_link_pattern.search(html) is not None or name_header_pattern.search(html) is not None
+
+# Function to read the PlayerID linked from each data row of a workout table, None for rows without a profile link
+def workout_player_ids(table_html):
+    player_ids = []
+    for row in table_row_pattern.findall(table_html):
+        if '<td' not in row.lower(): #header rows
+            continue
+        match = player_link_pattern.search(row)
+        player_ids.append(int(match.group(1)) if match else None)
+    return player_ids
+
+# Function to tell the results table from layout and empty tables by its structure: data rows linking to player profiles,
+# or a header with Name and other workout columns above at least one data row
+def is_workout_table(table_html):
+    player_ids = workout_player_ids(table_html)
+    if any(player_id is not None for player_id in player_ids):
+        return True
+    headers = {re.sub(r'<[^>]+>|&nbsp;?', '', cell).strip() for cell in header_cell_pattern.findall(table_html)}
+    return bool(player_ids) and 'Name' in headers and len(headers & workout_columns) >= 3
+
+# Function to find the workout results table (by id, else by structure) and parse only that table into a frame, keyed by PlayerID
+def extract_workout_table(page):
+    table = page.find_table(table_id=workout_table_id)
+    if table is None:
+        candidates = [(table, page.table_html(table)) for table in page.tables]
+        candidates = [(table, html) for table, html in candidates if is_workout_table(html)]
+        #layout tables wrapping the results qualify too, the innermost one (no table inside it) is the results table
+        innermost = [table for table, html in candidates if html.lower().count('<table') == 1]
+        table = next(iter(innermost or [table for table, _ in candidates]), None)
+    if table is None:
+        return None
+    html = page.table_html(table)
+    df = pd.read_html(StringIO(html))[0]
+    player_ids = workout_player_ids(html)
+    if len(player_ids) != len(df): #rows only line up when read_html kept every data row
+        logger.debug(f"Workout table has {len(df)} rows but {len(player_ids)} data rows - PlayerIDs left empty")
+        player_ids = [None] * len(df)
+    df.insert(0, 'PlayerID', pd.array(player_ids, dtype='Int64'))
+    return df
+
+# Function to parse a fetched WorkoutResults page into the event's workout table, runs inside a ParsePool worker when one is used
+def parse_event_page(html, engine=None, encoding='utf-8'):
+    html = decode(html, encoding)
+    if not has_workout_table(html): #short-circuits events without results before any parsing
+        return pd.DataFrame()
+
+    page = parse_page(html, engine) #single parse, shared by the table extractor and showcase labels
+    table = extract_workout_table(page)
+    if table is None:
+        return pd.DataFrame()
+    title, date = get_showcase_info(page) #utilizes specified HTML parser to find proper labels
+
+    return (table
+            .assign(ShowcaseTitle=title, ShowcaseDate=date)
+            .pipe(lambda df: df.replace(to_replace='&nbsp', value=' ', regex=True))) #categorizes and cleans a given event
+
+# Function to tell whether an event ended long enough ago that its page won't change anymore
+def is_historical_event(dates, days=30):
+    found = re.findall(r'\d{1,2}/\d{1,2}/\d{4}', str(dates))
+    if not found:
+        return False
+    end_date = datetime.strptime(found[-1], '%m/%d/%Y')
+    return datetime.now() - end_date > timedelta(days=days)
+
 # Function to process Single Event ID
-async def process_event(event_id, retries, semaphore):
-    url = f'https://www.perfectgame.org/events/Showcases/WorkoutResults.aspx?event={event_id}'
-    attempt = 0
-    while attempt < retries:
-        async with semaphore, httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url)
-                html = response.text
-                tables = pd.read_html(StringIO(html))
-                title, date = await get_showcase_info(html) #utilizes specified HTML parser to find proper labels
-
-                if len(tables) > 0:
-                    table = (tables[4]
-                            .assign(ShowcaseTitle=title, ShowcaseDate=date)
-                            .pipe(lambda df: df.replace(to_replace='&nbsp', value=' ', regex=True))) #categorizes and cleans a given event
-                    print(f"Event {event_id} processed")
-                    return table
-                
-            except IndexError as e: 
-                print(f"IndexError for Event {event_id}: {e}") #does not retry if Index Error - these are caused by data not existing
-                return None
-            
-            except Exception as e:
-                attempt += 1
-                print(f"Attempt {attempt} failed for Event {event_id}: {e}")
-                if attempt == retries:
-                        print(f"All {retries} retries have failed for Event {event_id} ")
-                        return None
+async def process_event(event_id, retries, semaphore=None, client=None, engine=None, parse_pool=None, limiter=None, cache=None, metrics=None):
+    url = f'/events/Showcases/WorkoutResults.aspx?event={event_id}'
+    async with shared_client(client) as client, semaphore or nullcontext(): #reuses pooled connections across events
+        try:
+            #served from the response cache when fresh, otherwise retries throttled and failed requests with backoff through the shared limiter
+            response = await cached_fetch(client, url, retries, limiter, cache, metrics)
+            #event loop only fetches bytes, parsing goes to the parse pool if given
+            with maybe_stage(metrics, 'parse'):
+                table = await run_parse(parse_pool, parse_event_page, response.content, engine, response.encoding)
+            if not table.empty:
+                table.insert(0, 'EventID', event_id) #keys the rows to their event once tables of many events are combined
+            if cache is not None and not table.empty and is_historical_event(table['ShowcaseDate'].iloc[0]):
+                cache.mark_immutable(str(client.base_url.join(url))) #finished events don't change, never revalidate them
+            logger.debug(f"Event {event_id} processed" if not table.empty else f"No workout results for Event {event_id}", extra={'event_id': event_id})
+            if metrics is not None:
+                metrics.record('done' if not table.empty else 'empty')
+            return table #empty frame marks an event without data, None marks a failed event
+
+        except IndexError as e:
+            #does not retry if Index Error - these are caused by data not existing
+            logger.debug(f"No data for Event {event_id}: {e}", extra={'event_id': event_id})
+            if metrics is not None:
+                metrics.record('empty')
+            return pd.DataFrame()
+
+        except Exception as e:
+            logger.warning(f"All {retries} retries have failed for Event {event_id}: {e}", extra={'event_id': event_id, 'reason': failure_reason(e)})
+            if metrics is not None:
+                metrics.record('failed', failure_reason(e))
+            return None
+
+#Function to lazily feed event IDs to a bounded pool of fetches, yielding (event_id, table) as each event finishes
+async def stream_events(event_ids, retries, threads, client=None, parse_pool=None, limiter=None, cache=None, metrics=None):
+    limiter = limiter or AdaptiveLimiter(maximum=threads)
+    async with shared_client(client, max_connections=threads, max_keepalive_connections=threads) as client:
+        fetch = lambda event_id: process_event(event_id, retries, client=client, parse_pool=parse_pool, limiter=limiter, cache=cache, metrics=metrics)
+        async for event_id, table in stream_results(fetch, event_ids, threads):
+            yield event_id, table
 
 #Function to concurrently scrape the data and concat into a table
-async def scrape_data(event_ids, retries, threads):
-    all_tables = pd.DataFrame()
-    semaphore = asyncio.Semaphore(threads)  # controls amount of concurrency
+async def scrape_data(event_ids, retries, threads, client=None, parse_pool=None, limiter=None, cache=None, metrics=None):
+    tables = [table async for _, table in stream_events(event_ids, retries, threads, client, parse_pool, limiter, cache, metrics) if table is not None and not table.empty]
 
-    tasks = [process_event(event_id, retries, semaphore) for event_id in event_ids]
-    tables = await asyncio.gather(*tasks) #utilizes created tasks to asynchronously process events
+    if not tables:
+        return pd.DataFrame()
 
-    all_tables = pd.concat([table for table in tables if table is not None], ignore_index=True) 
+    all_tables = pd.concat(tables, ignore_index=True)
 
-    return all_tables
+    return normalize_events(all_tables) #typed measurables, see Normalize_utils
 
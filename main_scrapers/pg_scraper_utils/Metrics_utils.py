@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger('pg_scraper')
+
+#upper bounds (seconds) of the stage timing histograms, Prometheus style
+stage_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+#item outcomes, the same statuses Output_utils.result_status gives finished IDs
+outcomes = ('done', 'empty', 'failed')
+
+
+class StructuredFormatter(logging.Formatter):
+    '''Formats records as one JSON object per line, with the fields passed in `extra` kept as keys.'''
+
+    reserved = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': round(record.created, 3), 'level': record.levelname, 'logger': record.name, 'message': record.getMessage()}
+        entry.update({key: value for key, value in vars(record).items() if key not in self.reserved})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level='INFO', structured: bool = False, filename: str = None) -> None:
+    """
+    Sends the scrapers' log records (logger 'pg_scraper') to stderr or a file.
+
+    Args:
+        level: lowest level shown. DEBUG shows every ID, INFO progress summaries, WARNING only failures.
+        structured (bool): one JSON object per line (ex. for log shippers) instead of plain text
+        filename (str, optional): file the log is appended to instead of stderr
+    """
+    handler = logging.FileHandler(filename) if filename else logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter() if structured else logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def duration(seconds: float) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+class StageTimer:
+    '''Histogram of one stage's durations: count, sum, max and cumulative bucket counts.'''
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(stage_buckets) + 1)  # last bucket is +Inf
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect_left(stage_buckets, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        '''Upper bound of the bucket holding the q-quantile, the observed max for the +Inf bucket.'''
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(stage_buckets, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class ScrapeMetrics:
+    """
+    Counters and stage timings of a scrape run, shared by every fetch of the run the same way a limiter is.
+
+    Stages timed are queue_wait (waiting for a limiter slot), fetch (the request itself), parse and write. Items are
+    counted by outcome ('done', 'empty', 'failed', failures also by status code or error), responses by status code
+    and retries by the status code or error that caused them. Rate and ETA come from finished items against `total`.
+
+    Args:
+        scraper (str): name the metrics are labelled with, ex. 'players'
+        total (int, optional): items the run is expected to finish, used for the ETA
+        log_every (float, optional): seconds between progress summaries logged at INFO. None only logs on finish.
+        export_filename (str, optional): file the Prometheus text export is rewritten to with every summary, ex. for
+            node_exporter's textfile collector
+
+    Usage:
+        metrics = ScrapeMetrics('players', total=50000, log_every=30, export_filename='pg_players.prom')
+        await scrape_all_players(1, 50001, 'pg_players.csv', metrics=metrics)
+    """
+
+    def __init__(self, scraper: str, total: int = None, log_every: float = None, export_filename: str = None):
+        self.scraper = scraper
+        self.total = total
+        self.log_every = log_every
+        self.export_filename = export_filename
+        self.stages = {}
+        self.items = Counter()
+        self.failures = Counter()
+        self.responses = Counter()
+        self.retries = Counter()
+        self.started = time.monotonic()
+        self.last_summary = self.started
+
+    @contextmanager
+    def stage(self, name: str):
+        '''Times the enclosed block as one observation of the stage.'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        self.stages.setdefault(name, StageTimer()).observe(seconds)
+
+    def response(self, status: int) -> None:
+        self.responses[status] += 1
+
+    def retry(self, reason) -> None:
+        self.retries[str(reason)] += 1
+
+    def record(self, outcome: str, reason=None) -> None:
+        '''Counts one finished item, then logs a summary if log_every seconds have passed since the last one.'''
+        self.items[outcome] += 1
+        if outcome == 'failed':
+            self.failures[str(reason or 'error')] += 1
+        if self.log_every is not None and time.monotonic() - self.last_summary >= self.log_every:
+            self.report()
+
+    @property
+    def finished(self) -> int:
+        return sum(self.items.values())
+
+    def rate(self) -> float:
+        '''Finished items per second since the run started.'''
+        elapsed = time.monotonic() - self.started
+        return self.finished / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> float:
+        '''Seconds left at the current rate, None without a total or before the first item.'''
+        rate = self.rate()
+        if self.total is None or not rate:
+            return None
+        return max(0, self.total - self.finished) / rate
+
+    def summary(self) -> str:
+        progress = f"{self.finished}/{self.total}" if self.total is not None else str(self.finished)
+        eta = self.eta()
+        parts = [f"{self.scraper}: {progress} finished", f"{self.rate():.1f}/s"]
+        if eta is not None:
+            parts.append(f"ETA {duration(eta)}")
+        parts.append(' '.join(f"{outcome}={self.items[outcome]}" for outcome in outcomes))
+        if self.failures:
+            parts.append('failed by cause ' + ' '.join(f"{reason}={count}" for reason, count in sorted(self.failures.items())))
+        if self.retries:
+            parts.append('retries ' + ' '.join(f"{reason}={count}" for reason, count in sorted(self.retries.items())))
+        stages = [f"{name} p50={timer.quantile(0.5) * 1000:.0f}ms p99={timer.quantile(0.99) * 1000:.0f}ms" for name, timer in self.stages.items()]
+        if stages:
+            parts.append(', '.join(stages))
+        return ' | '.join(parts)
+
+    def snapshot(self) -> dict:
+        '''Every counter and timing as plain values, ex. for a structured log record.'''
+        return {
+            'scraper': self.scraper, 'finished': self.finished, 'total': self.total, 'rate': round(self.rate(), 2), 'eta': self.eta(),
+            'items': dict(self.items), 'failures': dict(self.failures), 'responses': {str(status): count for status, count in self.responses.items()},
+            'retries': dict(self.retries),
+            'stages': {name: {'count': timer.count, 'sum': round(timer.sum, 3), 'p50': timer.quantile(0.5), 'p99': timer.quantile(0.99)}
+                       for name, timer in self.stages.items()},
+        }
+
+    def report(self, level: int = logging.INFO) -> None:
+        '''Logs the summary (with every counter attached as `metrics`) and rewrites the export file if one is set.'''
+        self.last_summary = time.monotonic()
+        logger.log(level, self.summary(), extra={'metrics': self.snapshot()})
+        if self.export_filename:
+            self.write_prometheus(self.export_filename)
+
+    def prometheus(self) -> str:
+        '''Every metric in the Prometheus text exposition format.'''
+        label = f'scraper="{self.scraper}"'
+        lines = ['# HELP pg_scraper_items_total Items finished, by outcome.', '# TYPE pg_scraper_items_total counter']
+        lines += [f'pg_scraper_items_total{{{label},outcome="{outcome}"}} {self.items[outcome]}' for outcome in outcomes]
+        lines += ['# HELP pg_scraper_failures_total Failed items, by the status code or error of their last attempt.',
+                  '# TYPE pg_scraper_failures_total counter']
+        lines += [f'pg_scraper_failures_total{{{label},reason="{reason}"}} {count}' for reason, count in sorted(self.failures.items())]
+        lines += ['# HELP pg_scraper_responses_total Responses received, by status code.', '# TYPE pg_scraper_responses_total counter']
+        lines += [f'pg_scraper_responses_total{{{label},status="{status}"}} {count}' for status, count in sorted(self.responses.items())]
+        lines += ['# HELP pg_scraper_retries_total Retried requests, by the status code or error that caused the retry.',
+                  '# TYPE pg_scraper_retries_total counter']
+        lines += [f'pg_scraper_retries_total{{{label},reason="{reason}"}} {count}' for reason, count in sorted(self.retries.items())]
+        lines += ['# HELP pg_scraper_stage_seconds Time spent per item in each stage.', '# TYPE pg_scraper_stage_seconds histogram']
+        for name, timer in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(stage_buckets + ('+Inf',), timer.buckets):
+                cumulative += count
+                lines.append(f'pg_scraper_stage_seconds_bucket{{{label},stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'pg_scraper_stage_seconds_sum{{{label},stage="{name}"}} {timer.sum:.6f}')
+            lines.append(f'pg_scraper_stage_seconds_count{{{label},stage="{name}"}} {timer.count}')
+        eta = self.eta()
+        lines += ['# HELP pg_scraper_rate Finished items per second since the run started.', '# TYPE pg_scraper_rate gauge',
+                  f'pg_scraper_rate{{{label}}} {self.rate():.3f}']
+        if eta is not None:
+            lines += ['# HELP pg_scraper_eta_seconds Seconds left at the current rate.', '# TYPE pg_scraper_eta_seconds gauge',
+                      f'pg_scraper_eta_seconds{{{label}}} {eta:.1f}']
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, filename: str) -> None:
+        #written next to the target and swapped in, so a scraper never reads a half written file
+        with open(f'{filename}.tmp', 'w') as f:
+            f.write(self.prometheus())
+        os.replace(f'{filename}.tmp', filename)
+
+
+@contextmanager
+def maybe_stage(metrics: ScrapeMetrics, name: str):
+    '''metrics.stage(name), or nothing when no metrics are collected.'''
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name):
+        yield
+
+
+def failure_reason(error: Exception) -> str:
+    '''Status code of a failed request, otherwise the error's class name (ex. ConnectTimeout).'''
+    response = getattr(error, 'response', None)
+    return str(response.status_code) if response is not None else type(error).__name__
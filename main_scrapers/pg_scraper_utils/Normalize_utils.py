@@ -0,0 +1,108 @@
+import re
+import numpy as np
+import pandas as pd
+
+null_values = ('', 'N/A', 'NA', 'nan', 'None', '-', '--')
+
+#feet-inches strings ("6-2") converted to inches, as scraped from profiles, stats tables, workout tables and rankings
+height_columns = ('Height', 'Ht', 'Height.TopResult', 'Height.ClassAvg')
+
+#few distinct values repeated across many rows, stored once per value as pandas categoricals
+categorical_columns = ('Position', 'Pos', 'BT', 'HSGrad', 'Grad')
+
+#whole numbers kept exact (float32 can't represent every ID above 16 million), nullable for missing values
+integer_columns = ('PlayerID', 'EventID', 'NatPGRank')
+
+#measurables of each page type, converted even when a batch happens to have no values for them
+player_measurables = ('BestPGGrade', 'Age', 'Height', 'Weight', 'Fastball', '60YardDash', '10YardSplit', 'OFVelocity', 'IFVelocity',
+                      '1BVelocity', 'ExitVelocity')
+event_measurables = ('Ht', 'Wt', '60', '10', 'FB', 'OF', 'IF', 'Pop', 'Exit Velo')
+ranking_measurables = ('Height', 'Weight')
+
+#profile stats table columns are <category>.<measure>, every measure is numeric whichever categories a profile lists
+stats_measures = ('TopResult', 'ClassAvg', 'Percentile')
+
+
+def numeric_values(series: pd.Series, height: bool = False, dtype: str = 'float32') -> pd.Series:
+    '''
+    Converts scraped strings such as "92 mph", "6.78", "95%" or "N/A" to floats (NaN when missing or unparseable).
+    Height columns also convert feet-inches strings such as "6-2" to inches.
+    '''
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(dtype)  # already parsed, ex. by read_html
+    text = series.astype(str).str.strip()
+    text = text.where(~text.isin(null_values))
+    if height:
+        feet_inches = text.str.extract(r'^(\d+)\s*[-\'\s]\s*(\d+(?:\.\d+)?)"?$')
+        inches = pd.to_numeric(feet_inches[0], errors='coerce') * 12 + pd.to_numeric(feet_inches[1], errors='coerce')
+        return inches.fillna(pd.to_numeric(text, errors='coerce')).astype(dtype)
+    text = text.str.replace(r'\s*(mph|%|sec|lbs?)$', '', regex=True, flags=re.IGNORECASE).str.replace(',', '')
+    return pd.to_numeric(text, errors='coerce').astype(dtype)
+
+
+def text_values(series: pd.Series) -> pd.Series:
+    '''Values of an undeclared column as text, numbers parsed upstream (ex. by read_html) written without a trailing ".0".'''
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series):
+        return series.map(lambda value: None if pd.isna(value) else np.format_float_positional(value, trim='-')).astype(object)
+    return series.astype(str).where(series.notna(), None).astype(object)
+
+
+def categorical_values(series: pd.Series) -> pd.Series:
+    text = series.astype(str).str.strip()
+    return text.where(~text.isin(null_values) & series.notna()).astype('category')
+
+
+def integer_values(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series, errors='coerce').astype('Int64')
+
+
+def declared_type(column) -> str:
+    '''Type a column is always stored with - 'integer', 'category' or 'float' - or None for columns without a declared type.'''
+    name = str(column)
+    if name in integer_columns:
+        return 'integer'
+    if name in categorical_columns:
+        return 'category'
+    if name in player_measurables or name in event_measurables or name in ranking_measurables or name in height_columns:
+        return 'float'
+    if '.' in name and name.rsplit('.', 1)[1] in stats_measures:
+        return 'float'
+    return None
+
+
+def normalize_frame(df: pd.DataFrame, measurables=()) -> pd.DataFrame:
+    """
+    Types a batch of scraped rows one column at a time: IDs and ranks become nullable integers, Position/BT/grad
+    year columns categoricals, and measurables float32 with NaN for missing values (heights in inches, units and
+    "%" dropped). Only declared columns are typed (see declared_type), every other column is kept as text, so a
+    column's type and values never depend on which rows happen to share a batch ("07" stays "07").
+
+    Args:
+        df (pd.DataFrame): batch as scraped
+        measurables: columns always converted to float32, even when this batch has no values in them
+
+    Returns:
+        pd.DataFrame: typed batch with the same columns and index.
+    """
+    numeric = set(measurables) | {col for col in df.columns if declared_type(col) == 'float'}
+    columns = {}
+    for col in df.columns:
+        if col in integer_columns:
+            columns[col] = integer_values(df[col])
+        elif col in categorical_columns:
+            columns[col] = categorical_values(df[col])
+        elif col in numeric:
+            columns[col] = numeric_values(df[col], height=col in height_columns)
+        else:
+            columns[col] = text_values(df[col])
+    return pd.DataFrame(columns, index=df.index)
+
+
+def normalize_events(df: pd.DataFrame) -> pd.DataFrame:
+    return normalize_frame(df, event_measurables)
+
+
+def normalize_rankings(df: pd.DataFrame) -> pd.DataFrame:
+    return normalize_frame(df, ranking_measurables)
@@ -0,0 +1,344 @@
+import csv
+import os
+import pandas as pd
+from pg_scraper_utils.Store_utils import StoreSink
+from pg_scraper_utils.Normalize_utils import height_columns, numeric_values, integer_values, declared_type, text_values
+from pg_scraper_utils.Metrics_utils import logger, maybe_stage
+
+class CsvSink:
+    """
+    Appends batches of rows to a CSV file as they arrive, so finished work is on disk before the run ends.
+
+    The header is set by the first batch written (or read back from the file when appending to an earlier run) and
+    later batches are aligned to it. A batch bringing columns the header doesn't have (ex. an event whose workout table
+    has extra measurements) widens it: the file is rewritten once with the new columns, empty for earlier rows.
+    Every write is flushed and fsynced before returning.
+
+    Args:
+        filename (str): CSV file being written
+        append (bool): keeps existing rows and header instead of overwriting the file
+    """
+
+    def __init__(self, filename: str, append: bool = False):
+        self.filename = filename
+        self.columns = None
+        if append and os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, newline='', encoding='utf-8') as f:
+                self.columns = next(csv.reader(f))
+        else:
+            open(filename, 'w').close()
+        self.rows_written = 0
+
+    def widen(self, new_columns: list) -> None:
+        #written next to the file and swapped in, a crash mid-rewrite leaves the old file intact
+        staging = f'{self.filename}.tmp'
+        with open(self.filename, newline='', encoding='utf-8') as source, open(staging, 'w', newline='', encoding='utf-8') as target:
+            reader, writer = csv.reader(source), csv.writer(target)
+            next(reader, None)
+            writer.writerow(self.columns + new_columns)
+            padding = [''] * len(new_columns)
+            for row in reader:
+                writer.writerow(row + padding)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(staging, self.filename)
+        self.columns = self.columns + new_columns
+        logger.info(f"Columns {new_columns} added to the header of {self.filename}")
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        df = df.rename(columns=str)
+        header = self.columns is None
+        if header:
+            self.columns = list(df.columns)
+        else:
+            new_columns = [col for col in df.columns if col not in self.columns]
+            if new_columns:
+                self.widen(new_columns)
+            df = df.reindex(columns=self.columns)
+
+        with open(self.filename, 'a', newline='', encoding='utf-8') as f:
+            df.to_csv(f, header=header, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows_written += len(df)
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetSink:
+    """
+    Writes batches of rows to a Parquet dataset directory with typed columns, one part file (a single row group) per batch.
+
+    Column types are declared by name rather than guessed from the data (see Normalize_utils.declared_type): IDs and
+    ranks are int64, measurables and stats float32, categoricals strings, and every other column a string, so a value
+    such as a team name in a column that happened to be numeric so far is kept as written. A batch bringing columns the
+    dataset doesn't have widens it: the new columns are added, empty, to the parts already written. Each part is written
+    to a temporary file and moved into place, so a crash never leaves a half written part behind. Read back with
+    pd.read_parquet(filename).
+
+    Args:
+        filename (str): dataset directory being written (ex. 'pg_players.parquet')
+        append (bool): keeps existing parts instead of clearing the directory
+    """
+
+    def __init__(self, filename: str, append: bool = False):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for parquet output - install it with 'pip install pyarrow'")
+        self.pa, self.pq = pa, pq
+        self.filename = filename
+        self.schema = None
+        os.makedirs(filename, exist_ok=True)
+        parts = self.parts()
+        if append and parts:
+            self.schema = pq.read_schema(os.path.join(filename, parts[-1]))
+        else:
+            for part in parts:
+                os.remove(os.path.join(filename, part))
+            parts = []
+        self.part_number = len(parts)
+        self.rows_written = 0
+
+    def parts(self) -> list:
+        return sorted(name for name in os.listdir(self.filename) if name.startswith('part-') and name.endswith('.parquet'))
+
+    def field_type(self, column: str):
+        declared = declared_type(column)
+        if declared == 'integer':
+            return self.pa.int64()
+        if declared == 'float':
+            return self.pa.float32()
+        return self.pa.string()
+
+    def build_schema(self, columns: list):
+        return self.pa.schema([self.pa.field(col, self.field_type(col)) for col in columns])
+
+    def widen(self, new_columns: list) -> None:
+        #parts already written get the new columns as nulls, so every part keeps the dataset's schema
+        new_fields = [self.pa.field(col, self.field_type(col)) for col in new_columns]
+        for name in self.parts():
+            part = os.path.join(self.filename, name)
+            table = self.pq.read_table(part)
+            for field in new_fields:
+                table = table.append_column(field, self.pa.nulls(len(table), field.type))
+            self.pq.write_table(table, part + '.tmp', row_group_size=max(1, len(table)))
+            os.replace(part + '.tmp', part)
+        self.schema = self.pa.schema(list(self.schema) + new_fields)
+        logger.info(f"Columns {new_columns} added to the schema of {self.filename}")
+
+    def typed(self, df: pd.DataFrame) -> pd.DataFrame:
+        columns = {}
+        for field in self.schema:
+            if field.name not in df.columns:
+                columns[field.name] = pd.Series([None] * len(df), dtype=object)
+            elif self.pa.types.is_floating(field.type):
+                columns[field.name] = numeric_values(df[field.name], height=field.name in height_columns, dtype=field.type.to_pandas_dtype())
+            elif self.pa.types.is_integer(field.type):
+                columns[field.name] = integer_values(df[field.name])
+            else:
+                col = text_values(df[field.name]) #92.0 -> '92', not '92.0'
+                columns[field.name] = col.astype(str).where(col.notna(), None)
+        return pd.DataFrame(columns, index=df.index)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        df = df.rename(columns=str)
+        if self.schema is None:
+            self.schema = self.build_schema(list(df.columns))
+        new_columns = [col for col in df.columns if col not in self.schema.names]
+        if new_columns:
+            self.widen(new_columns)
+
+        table = self.pa.Table.from_pandas(self.typed(df), schema=self.schema, preserve_index=False)
+        self.part_number += 1
+        part = os.path.join(self.filename, f'part-{self.part_number:05d}.parquet')
+        self.pq.write_table(table, part + '.tmp', row_group_size=len(df))
+        os.replace(part + '.tmp', part)
+        self.rows_written += len(df)
+
+    def close(self) -> None:
+        pass
+
+
+sink_formats = {
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+    'sqlite': StoreSink,
+}
+
+#formats writing into a table of a shared database rather than a file of their own
+table_formats = ('sqlite',)
+
+
+def open_sink(filename: str, output_format: str = 'csv', append: bool = False, table: str = None, fixed: dict = None):
+    '''
+    Creates the sink registered for output_format (see sink_formats) writing to filename.
+    Table formats also take the table written to ('players', 'events', 'rankings', 'name_matches') and values added to every row (see StoreSink).
+    '''
+    if output_format not in sink_formats:
+        raise ValueError(f"Unknown output format '{output_format}' - choose from {list(sink_formats)}")
+    if output_format in table_formats:
+        return sink_formats[output_format](filename, append=append, table=table or 'players', fixed=fixed)
+    return sink_formats[output_format](filename, append=append)
+
+
+def checkpoint_name(filename: str, output_format: str = 'csv', table: str = None) -> str:
+    '''Default checkpoint file of an output, one per table when several scrapers share a database.'''
+    if output_format in table_formats:
+        return f'{filename}.{table or "players"}.checkpoint'
+    return f'{filename}.checkpoint'
+
+
+class Checkpoint:
+    """
+    Append-only record of IDs finished by a sweep, one "id,status" line per ID.
+
+    Statuses are 'done' (rows written), 'empty' (page had no data) and 'failed' (retries exhausted). Done and empty
+    IDs are skipped when a sweep is rerun over the same range, failed IDs are attempted again.
+
+    Args:
+        filename (str): checkpoint file, created if it doesn't exist
+        reset (bool): discards any earlier progress in the file
+    """
+
+    complete_statuses = ('done', 'empty')
+
+    def __init__(self, filename: str, reset: bool = False):
+        self.filename = filename
+        self.status = {}
+        if reset or not os.path.exists(filename):
+            open(filename, 'w').close()
+        else:
+            with open(filename, newline='') as f:
+                for row in csv.reader(f):
+                    if len(row) == 2: #ignores a partially written last line
+                        self.status[int(row[0]) if row[0].isdigit() else row[0]] = row[1]
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def is_complete(self, item_id) -> bool:
+        return self.status.get(item_id) in self.complete_statuses
+
+    def pending(self, ids):
+        '''Lazily filters an ID iterable down to the IDs that still need scraping.'''
+        return (item_id for item_id in ids if not self.is_complete(item_id))
+
+    def record(self, finished: list) -> None:
+        if not finished:
+            return
+        with open(self.filename, 'a', newline='') as f:
+            csv.writer(f).writerows(finished)
+            f.flush()
+            os.fsync(f.fileno())
+        self.status.update(finished)
+
+    def counts(self) -> dict:
+        counts = {}
+        for status in self.status.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+class ColumnBuffer:
+    """
+    Collects scraped records (dicts) into one list per column, so a batch becomes a DataFrame in a single construction
+    instead of a concat of one-row frames. Columns start from a fixed schema, and keys outside it (ex. a stats category
+    only some profiles list) are added as new columns after the schema ones, empty for the rows before them. The sinks
+    widen their output when such a column first reaches them.
+
+    Args:
+        columns (list): schema columns, in output order
+    """
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        self.buffers = {col: [] for col in self.columns}
+
+    def __len__(self) -> int:
+        return len(self.buffers[self.columns[0]]) if self.columns else 0
+
+    def append(self, record: dict) -> None:
+        if len(record) > len(self.columns) or any(key not in self.buffers for key in record):
+            new = [key for key in record if key not in self.buffers]
+            logger.info(f"Fields {new} are not in the schema and were added as columns")
+            rows = len(self)
+            for key in new:
+                self.columns.append(key)
+                self.buffers[key] = [None] * rows
+        for col, buffer in self.buffers.items():
+            buffer.append(record.get(col))
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.buffers, columns=self.columns)
+
+    def clear(self) -> None:
+        for buffer in self.buffers.values():
+            buffer.clear()
+
+
+def result_status(result) -> str:
+    #results are DataFrames or plain records (dicts), either one empty when the page had no data
+    if result is None:
+        return 'failed'
+    if len(result) == 0:
+        return 'empty'
+    return 'done'
+
+
+async def write_stream(results, sink, checkpoint: Checkpoint, batch_size: int = 500, prepare=None, columns: list = None, metrics=None) -> int:
+    """
+    Consumes (id, DataFrame) pairs from a scrape stream and writes them to a sink in batches.
+
+    Each batch is written to the sink before its IDs are recorded in the checkpoint, so a crash can at most repeat
+    the last batch on resume, never lose it. Whatever has been collected is flushed on Ctrl+C, cancellation or error.
+
+    Args:
+        results: async iterable of (id, DataFrame or None) pairs, ex. from Scheduler_utils.stream_results
+        sink: output sink with a write(DataFrame) method
+        checkpoint (Checkpoint): record of finished IDs
+        batch_size (int): amount of IDs collected between writes
+        prepare (optional): function applied to each concatenated batch before it is written
+        columns (list, optional): fixed schema for results that are plain records (dicts) instead of DataFrames.
+            Records are collected into a ColumnBuffer and turned into one DataFrame per batch.
+        metrics (ScrapeMetrics, optional): run metrics, given the time each batch takes to prepare and write
+
+    Returns:
+        int: amount of rows written during this call.
+    """
+    batch = ColumnBuffer(columns) if columns is not None else []
+    finished = []
+    rows_written = 0
+
+    def flush():
+        nonlocal rows_written
+        if len(batch):
+            df = batch.to_frame() if columns is not None else pd.concat(batch, ignore_index=True)
+            if prepare is not None:
+                with maybe_stage(metrics, 'prepare'):
+                    df = prepare(df)
+            with maybe_stage(metrics, 'write'):
+                sink.write(df)
+            rows_written += len(df)
+        checkpoint.record(finished)
+        batch.clear()
+        finished.clear()
+
+    try:
+        async for item_id, result in results:
+            status = result_status(result)
+            finished.append((item_id, status))
+            if status == 'done':
+                batch.append(result)
+            if len(finished) >= batch_size:
+                flush()
+    finally:
+        flush()
+
+    return rows_written
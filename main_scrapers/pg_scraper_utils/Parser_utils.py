@@ -0,0 +1,236 @@
+import asyncio
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from bs4 import BeautifulSoup
+
+Node = namedtuple('Node', ['tag', 'text', 'attrs'])  # element with an id: tag name, full text content and attributes
+Row = namedtuple('Row', ['cells', 'ids'])  # table row: text of each td and a dict of id -> Node for elements inside the row
+
+
+def available_engines() -> list:
+    '''Parser engines importable in this environment, fastest first.'''
+    engines = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+        engines.append('selectolax')
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        engines.append('lxml')
+    except ImportError:
+        pass
+    engines.append('html.parser')
+    return engines
+
+
+default_engine = available_engines()[0]
+
+
+class LxmlPage:
+    '''Page parsed with lxml, with every element id indexed in a single pass over the tree.'''
+
+    def __init__(self, html):
+        import lxml.html
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        root = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding='utf-8'))
+        self.index = {}
+        self.tables = []
+        for el in root.iter():
+            if not isinstance(el.tag, str):  # skips comments and processing instructions
+                continue
+            el_id = el.get('id')
+            if el_id is not None and el_id not in self.index:
+                self.index[el_id] = el
+            if el.tag == 'table':
+                self.tables.append(el)
+
+    def node(self, element_id: str) -> Node:
+        el = self.index.get(element_id)
+        return Node(el.tag, el.text_content(), dict(el.attrib)) if el is not None else None
+
+    def find_table(self, table_id: str = None, table_class: str = None):
+        if table_id is not None:
+            table = self.index.get(table_id)
+            return table if table is not None and table.tag == 'table' else None
+        return next((table for table in self.tables if table.get('class') == table_class), None)
+
+    def table_rows(self, table) -> list:
+        rows = []
+        for tr in table.iter('tr'):
+            ids = {}
+            for el in tr.iter():
+                if isinstance(el.tag, str) and el.get('id') is not None:
+                    ids.setdefault(el.get('id'), Node(el.tag, el.text_content(), dict(el.attrib)))
+            rows.append(Row([td.text_content() for td in tr.iter('td')], ids))
+        return rows
+
+    def table_html(self, table) -> str:
+        import lxml.html
+        return lxml.html.tostring(table, encoding='unicode')
+
+
+class SelectolaxPage:
+    '''Page parsed with selectolax (lexbor), with every element id indexed in a single pass over the tree.'''
+
+    def __init__(self, html):
+        from selectolax.lexbor import LexborHTMLParser
+        tree = LexborHTMLParser(html)
+        self.index = {}
+        self.tables = []
+        for el in tree.root.traverse():
+            el_id = el.attributes.get('id') if el.tag != '-text' else None
+            if el_id is not None and el_id not in self.index:
+                self.index[el_id] = el
+            if el.tag == 'table':
+                self.tables.append(el)
+
+    @staticmethod
+    def to_node(el) -> Node:
+        return Node(el.tag, el.text(deep=True), dict(el.attributes))
+
+    def node(self, element_id: str) -> Node:
+        el = self.index.get(element_id)
+        return self.to_node(el) if el is not None else None
+
+    def find_table(self, table_id: str = None, table_class: str = None):
+        if table_id is not None:
+            table = self.index.get(table_id)
+            return table if table is not None and table.tag == 'table' else None
+        return next((table for table in self.tables if table.attributes.get('class') == table_class), None)
+
+    def table_rows(self, table) -> list:
+        rows = []
+        for tr in table.css('tr'):
+            ids = {}
+            for el in tr.css('[id]'):
+                ids.setdefault(el.attributes['id'], self.to_node(el))
+            rows.append(Row([td.text(deep=True) for td in tr.css('td')], ids))
+        return rows
+
+    def table_html(self, table) -> str:
+        return table.html
+
+
+class SoupPage:
+    '''Page parsed with BeautifulSoup's html.parser, kept as the fallback engine when lxml/selectolax are not installed.'''
+
+    def __init__(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        self.index = {}
+        for el in soup.find_all(id=True):
+            self.index.setdefault(el['id'], el)
+        self.tables = soup.find_all('table')
+
+    @staticmethod
+    def to_node(el) -> Node:
+        attrs = {key: ' '.join(value) if isinstance(value, list) else value for key, value in el.attrs.items()}
+        return Node(el.name, el.text, attrs)
+
+    def node(self, element_id: str) -> Node:
+        el = self.index.get(element_id)
+        return self.to_node(el) if el is not None else None
+
+    def find_table(self, table_id: str = None, table_class: str = None):
+        if table_id is not None:
+            table = self.index.get(table_id)
+            return table if table is not None and table.name == 'table' else None
+        return next((table for table in self.tables if ' '.join(table.get('class', [])) == table_class), None)
+
+    def table_rows(self, table) -> list:
+        rows = []
+        for tr in table.find_all('tr'):
+            ids = {}
+            for el in tr.find_all(id=True):
+                ids.setdefault(el['id'], self.to_node(el))
+            rows.append(Row([td.text for td in tr.find_all('td')], ids))
+        return rows
+
+    def table_html(self, table) -> str:
+        return str(table)
+
+
+engines = {
+    'selectolax': SelectolaxPage,
+    'lxml': LxmlPage,
+    'html.parser': SoupPage,
+}
+
+
+def parse_page(html, engine: str = None):
+    """
+    Parses a page once and indexes every element id, so repeated lookups by id are dictionary hits instead of tree walks.
+
+    Args:
+        html (str): page source
+        engine (str, optional): 'selectolax', 'lxml' or 'html.parser'. Defaults to the fastest installed engine.
+
+    Returns:
+        A page object with node(id), find_table(table_id, table_class), table_rows(table) and table_html(table).
+    """
+    engine = engine or default_engine
+    if engine not in engines:
+        raise ValueError(f"Unknown parser engine '{engine}' - choose from {list(engines)}")
+    return engines[engine](html)
+
+
+def node_text(page, element_id: str, default: str = 'N/A') -> str:
+    node = page.node(element_id)
+    return node.text if node is not None else default
+
+
+def decode(html, encoding: str = 'utf-8') -> str:
+    '''Decodes raw response bytes handed over by the fetch layer, str input is returned as is.'''
+    return html.decode(encoding or 'utf-8', errors='replace') if isinstance(html, bytes) else html
+
+
+class ParsePool:
+    """
+    Runs CPU-bound page parsing in a process pool so the event loop only has to fetch bytes.
+
+    At most max_pending parse jobs are queued or running at once; fetchers wait for a free slot before handing
+    over another page, which keeps memory bounded when the site responds faster than pages can be parsed.
+
+    Args:
+        workers (int, optional): amount of parser processes. 0 parses inline on the event loop, None uses every core.
+        max_pending (int, optional): parse jobs allowed in flight. Defaults to twice the amount of workers.
+
+    Notes:
+        Functions run in the pool must be defined at module level so they can be pickled.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.executor = ProcessPoolExecutor(self.workers) if self.workers > 0 else None
+        self.pending = asyncio.Semaphore(max_pending or 2 * max(self.workers, 1))
+
+    async def run(self, func, *args):
+        if self.executor is None:
+            return func(*args)
+        async with self.pending:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+
+async def run_parse(pool: ParsePool, func, *args):
+    '''Runs func through the parse pool when one is given, inline otherwise.'''
+    return func(*args) if pool is None else await pool.run(func, *args)
+
+
+@asynccontextmanager
+async def shared_parse_pool(pool: ParsePool = None, workers: int = 0):
+    '''Yields the given pool untouched, or creates (and shuts down on exit) a new one with the given amount of workers.'''
+    if pool is not None:
+        yield pool
+        return
+    pool = ParsePool(workers)
+    try:
+        yield pool
+    finally:
+        pool.close()
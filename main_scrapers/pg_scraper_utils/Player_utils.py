@@ -6,10 +6,16 @@ import nest_asyncio
 import traceback
 from asyncio import Semaphore
 import re
+from pg_scraper_utils.Client_utils import shared_client
+from pg_scraper_utils.Parser_utils import parse_page, node_text, decode, run_parse
+from pg_scraper_utils.Cache_utils import cached_fetch
+from pg_scraper_utils.Directory_utils import load_player_directory
+from pg_scraper_utils.Output_utils import ColumnBuffer
+from pg_scraper_utils.Normalize_utils import normalize_frame, player_measurables, stats_measures
+from pg_scraper_utils.Metrics_utils import logger, maybe_stage, failure_reason
 
 
-async def get_player_info(soup):
-    elements = {
+player_info_elements = {
         'PlayerName': 'ContentTopLevel_ContentPlaceHolder1_lblPlayerName',
         'School': 'ContentTopLevel_ContentPlaceHolder1_hl4yearCommit',
         'BestPGGrade': 'ContentTopLevel_ContentPlaceHolder1_lblBestPGGrade',
@@ -29,96 +35,154 @@ async def get_player_info(soup):
         'IFVelocity': 'ContentTopLevel_ContentPlaceHolder1_lblPGEventResultsIF',
         '1BVelocity': 'ContentTopLevel_ContentPlaceHolder1_lblPGEventResults1B',
         'ExitVelocity': 'ContentTopLevel_ContentPlaceHolder1_lblPGEventResultsExitVelo'
-    }
+}
+
+#categories of the "Event Stats Compared to Class" table, each flattened into <category>.<measure> columns. These lead the
+#schema in this order, any other category a profile lists is added after them as it shows up (see Output_utils.ColumnBuffer)
+stats_categories = ['Fastball', '60 Yard Dash', '10 Yard Split', 'OF Velocity', 'IF Velocity', '1B Velocity', 'Exit Velocity', 'Height', 'Weight']
+
+#player schema: every batch has at least these columns in this order, whichever stats the players in it happen to have
+player_columns = ['PlayerID'] + list(player_info_elements) + [f'{category}.{measure}' for category in stats_categories for measure in stats_measures]
+player_text_columns = ['PlayerName', 'School', 'HSGrad', 'Position', 'Hometown', 'TournamentTeam', 'HS', 'BT']
+player_numeric_columns = list(player_measurables) + [f'{category}.{measure}' for category in stats_categories for measure in stats_measures]
+
+
+def get_player_info(page):
+    elements = player_info_elements
     
     #Attempts to map labels to values found in site
     try: 
-        player_info = {field: soup.find(id=element_id).text if soup.find(id=element_id) else "N/A" for field, element_id in elements.items()}
+        player_info = {field: node_text(page, element_id) for field, element_id in elements.items()} #id lookups hit the page index, no tree walks
         return player_info
 
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.warning(f"An error occurred: {e}")
         return {field: "N/A" for field in elements.keys()}
 
 
-async def get_stats_table_info(soup):
-    table = soup.find("table", {"class": "table table-condensed"})
-    if table:
+def get_stats_table_info(page):
+    table = page.find_table(table_class="table table-condensed")
+    if table is not None:
         stats = {}
-        rows = table.find_all('tr')[1:]
+        rows = page.table_rows(table)[1:]
         
         #Looks for Top Results, Class Averages, and Percentiles for each category above
         for row in rows: 
-            cols = row.find_all('td')
-            category = cols[0].text.strip() if cols else 'N/A'
+            cols = row.cells
+            category = cols[0].strip() if cols else 'N/A'
             stats[category] = {
-                'TopResult': cols[1].text.strip() if len(cols) > 1 else 'N/A',
-                'ClassAvg': cols[2].text.strip() if len(cols) > 2 else 'N/A',
-                'Percentile': cols[3].text.strip() if len(cols) > 3 else 'N/A',
+                'TopResult': cols[1].strip() if len(cols) > 1 else 'N/A',
+                'ClassAvg': cols[2].strip() if len(cols) > 2 else 'N/A',
+                'Percentile': cols[3].strip() if len(cols) > 3 else 'N/A',
             }
         return stats
     else:
         return {'TableNotFound': 'True'}
 
-async def process_player(player_id, retries):
-    url = f'https://www.perfectgame.org/Players/PlayerProfile.aspx?ID={player_id}'
-    attempt = 0
-    while attempt < retries:
+# Parses a fetched profile page into a flat record (see player_columns), runs inside a ParsePool worker when one is used
+def parse_player_page(html, player_id, engine=None, encoding='utf-8'):
+    page = parse_page(decode(html, encoding), engine) #single parse, shared by both extractors
+
+    player_info = get_player_info(page)
+    player_info['PlayerID'] = player_id
+    for category, measures in get_stats_table_info(page).items():
+        if isinstance(measures, dict): #stats get their own columns, so the Height/Weight rows no longer overwrite the profile's Height/Weight
+            for measure, value in measures.items():
+                player_info[f'{category}.{measure}'] = value
+
+    return {field: value.replace('\n', ' ') if isinstance(value, str) else value for field, value in player_info.items()}
+
+async def process_player(player_id, retries, client=None, engine=None, parse_pool=None, limiter=None, cache=None, metrics=None):
+    url = f'/Players/PlayerProfile.aspx?ID={player_id}'
+    async with shared_client(client) as client: #reuses pooled connections across players
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url)
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                player_info = await get_player_info(soup)
-                player_info['PlayerID'] = player_id
-                stats_info = await get_stats_table_info(soup)
-
-                player_info.update(stats_info)
-                print(f"Successfully scraped data for Player ID {player_id}")
-                return pd.json_normalize(player_info).replace('\n', ' ', regex=True)
-            
+            #served from the response cache when fresh, otherwise retries throttled and failed requests with backoff through the shared limiter
+            response = await cached_fetch(client, url, retries, limiter, cache, metrics)
+            #event loop only fetches bytes, parsing goes to the parse pool if given
+            with maybe_stage(metrics, 'parse'):
+                player_data = await run_parse(parse_pool, parse_player_page, response.content, player_id, engine, response.encoding)
+            logger.debug(f"Scraped Player ID {player_id}", extra={'player_id': player_id})
+            if metrics is not None:
+                metrics.record('done')
+            return player_data
+
         except IndexError as e:
-                print(f"IndexError for Event {player_id}: {e}") #does not retry if Index Error - these are caused by entries not existing
-                return None
+            #does not retry if Index Error - these are caused by entries not existing
+            logger.debug(f"No data for Player ID {player_id}: {e}", extra={'player_id': player_id})
+            if metrics is not None:
+                metrics.record('empty')
+            return {} #empty record marks a player without data, None marks a failed player
 
         except Exception as e:
-            attempt += 1
-            print(f"Attempt {attempt} failed for Player ID {player_id}: {e}")
-            if attempt == retries:
-                print(f"All {retries} retries failed for Player ID {player_id}")
-                return None
+            logger.warning(f"All {retries} retries failed for Player ID {player_id}: {e}", extra={'player_id': player_id, 'reason': failure_reason(e)})
+            if metrics is not None:
+                metrics.record('failed', failure_reason(e))
+            return None
 
-async def find_id_from_name(name: str):
-    
-    player_id_info = pd.read_csv("Perfect-Game-Baseball-Scraper/resource_files/perfect_game_player_ids.csv", usecols=['PlayerID','PlayerName']) 
-    matching_players = player_id_info[player_id_info['PlayerName'].str.contains(name, case=False, na=False)]
-    
-    return matching_players[['PlayerName', 'PlayerID']].to_dict('records')
+# directory can be a Directory_utils.PlayerDirectory or a Store_utils.PGStore, both answer the same search
+async def find_id_from_name(name: str, directory=None):
 
+    directory = directory or load_player_directory() #player ID file is loaded and indexed once per process
+    return directory.search(name=name)
 
-async def find_ids_from_filters(age=None, position=None, graduation_year=None):
 
-    # Load the player information from a CSV file
-    player_id_info = pd.read_csv("Perfect-Game-Baseball-Scraper/resource_files/perfect_game_player_ids.csv").assign(
-        Age=lambda x: x['Age'].astype(str),
-        GraduationYear=lambda x: x['HSGrad'].astype(str)
-    )
-    
-    # Apply filters based on provided arguments, using the modified DataFrame
-    if age is not None:
-        age_str = str(age)
-        modified_df = player_id_info[player_id_info['Age'].str.contains(age_str, na=False)]
-    
-    if position is not None:
-        modified_df = player_id_info[player_id_info['Position'].str.contains(position, case=False, na=False)]
-    
-    if graduation_year is not None:
-        grad_year_str = str(graduation_year)
-        modified_df = player_id_info[player_id_info['GraduationYear'].str.contains(grad_year_str, na=False)]
-    
-    # Return the filtered list of player names and IDs
-    return modified_df[['PlayerName', 'PlayerID']].to_dict('records')
+async def find_ids_from_filters(age=None, position=None, graduation_year=None, directory=None):
+
+    # Filters are combined - a player has to meet every provided filter
+    directory = directory or load_player_directory()
+    return directory.search(age=age, position=position, graduation_year=graduation_year)
+
+def name_query(item) -> dict:
+    '''
+    A name to resolve as a dict of name, graduation_year and position, from a plain name, a (name, year, position) tuple or a dict.
+    NaN, None and other scalars (ex. a blank cell of a spreadsheet column) give a query with no name, which matches nothing.
+    '''
+    if isinstance(item, str):
+        return {'name': item, 'graduation_year': None, 'position': None}
+    if isinstance(item, dict):
+        return {'name': item.get('name'), 'graduation_year': item.get('graduation_year'), 'position': item.get('position')}
+    if not pd.api.types.is_list_like(item):
+        return {'name': None, 'graduation_year': None, 'position': None}
+    name, graduation_year, position = (tuple(item) + (None, None))[:3]
+    return {'name': name, 'graduation_year': graduation_year, 'position': position}
+
+
+def resolve_player_names(queries, directory=None, candidates: int = 5, min_confidence: float = 0.5) -> list:
+    '''
+    Fuzzy matches every name against the directory (see Directory_utils.PlayerDirectory.match), without any request.
+    Returns (query, ranked candidates) pairs in the order of the queries.
+    '''
+    directory = directory or load_player_directory()
+    resolved = []
+    for query in map(name_query, queries):
+        if query['name'] is None or pd.isna(query['name']):
+            resolved.append((query, []))
+            continue
+        matches = directory.match(query['name'], query['graduation_year'], query['position'], candidates, min_confidence)
+        resolved.append((query, matches))
+    return resolved
 
 def clean_string(s):
     return re.sub(r'^0+\s*', '', str(s).strip())
-    
\ No newline at end of file
+    
+def clean_player_batch(df):
+    '''
+    Cleans and types a batch of players one column at a time: text is stripped (leading zeros included, as clean_string does),
+    then measurables become float32, Position/BT/HSGrad categoricals and PlayerID an integer (see Normalize_utils.normalize_frame).
+    '''
+    columns = {}
+    for col in df.columns:
+        if col in player_text_columns:
+            text = df[col].astype('string').str.strip().str.replace(r'^0+\s*', '', regex=True)
+            columns[col] = text.fillna('').astype(object)
+        else:
+            columns[col] = df[col]
+    return normalize_frame(pd.DataFrame(columns, index=df.index), player_numeric_columns) #stats categories outside the schema are declared floats too
+
+def player_frame(records):
+    '''Builds a typed frame with the fixed player schema from player records, skipping failed and empty ones.'''
+    batch = ColumnBuffer(player_columns)
+    for record in records:
+        if record:
+            batch.append(record)
+    return clean_player_batch(batch.to_frame())
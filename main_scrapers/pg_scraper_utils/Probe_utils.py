@@ -0,0 +1,156 @@
+import sqlite3
+import time
+from pg_scraper_utils.Scheduler_utils import stream_results
+from pg_scraper_utils.Metrics_utils import logger
+
+
+def player_exists(result) -> bool:
+    '''Nonexistent player IDs still return a profile page, with every field "N/A".'''
+    return bool(result) and str(result.get('PlayerName', '')).strip() not in ('', 'N/A')
+
+
+def event_exists(result) -> bool:
+    '''Nonexistent event IDs come back as an empty table.'''
+    return result is not None and not result.empty
+
+
+class IdIndex:
+    """
+    Persistent record of which IDs of a kind ('player', 'event') exist, filled in by probes and sweeps.
+
+    Every checked ID is stored with whether it was valid and when it was checked, so later runs know the live
+    ID ranges without fetching anything, and recently checked dead IDs aren't probed again.
+
+    Args:
+        filename (str): SQLite file, created if it doesn't exist (ex. 'pg_ids.sqlite')
+        kind (str): ID space tracked, so players and events can share one file
+    """
+
+    def __init__(self, filename: str, kind: str):
+        self.filename = filename
+        self.kind = kind
+        self.db = sqlite3.connect(filename)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS known_ids (
+                               kind TEXT NOT NULL, item_id INTEGER NOT NULL, valid INTEGER NOT NULL, checked_at REAL NOT NULL,
+                               PRIMARY KEY (kind, item_id)) WITHOUT ROWID''')
+        self.db.commit()
+
+    def record(self, checked: list) -> None:
+        '''Stores (id, valid) pairs.'''
+        now = time.time()
+        self.db.executemany('INSERT OR REPLACE INTO known_ids (kind, item_id, valid, checked_at) VALUES (?, ?, ?, ?)',
+                            [(self.kind, item_id, int(valid), now) for item_id, valid in checked])
+        self.db.commit()
+
+    def valid_ids(self, start: int, end: int) -> list:
+        return [item_id for (item_id,) in self.db.execute(
+            'SELECT item_id FROM known_ids WHERE kind = ? AND item_id >= ? AND item_id < ? AND valid = 1 ORDER BY item_id', (self.kind, start, end))]
+
+    def has_valid(self, start: int, end: int) -> bool:
+        return self.db.execute('SELECT 1 FROM known_ids WHERE kind = ? AND item_id >= ? AND item_id < ? AND valid = 1 LIMIT 1',
+                               (self.kind, start, end)).fetchone() is not None
+
+    def checked_since(self, start: int, end: int, since: float) -> dict:
+        '''IDs in [start, end) checked after `since` -> whether they were valid.'''
+        return dict(self.db.execute('SELECT item_id, valid FROM known_ids WHERE kind = ? AND item_id >= ? AND item_id < ? AND checked_at >= ?',
+                                    (self.kind, start, end, since)))
+
+    async def track(self, results, is_valid, batch_size: int = 500):
+        '''Passes (id, result) pairs from a scrape stream through, recording each finished ID's validity. Failed fetches are not recorded.'''
+        checked = []
+        try:
+            async for item_id, result in results:
+                if result is not None:
+                    checked.append((item_id, is_valid(result)))
+                    if len(checked) >= batch_size:
+                        self.record(checked)
+                        checked.clear()
+                yield item_id, result
+        finally:
+            self.record(checked)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def block_samples(block_start: int, block_end: int, samples: int) -> list:
+    '''Evenly spaced IDs across a block, the same ones every run so earlier checks can be reused.'''
+    step = max(1, (block_end - block_start) // samples)
+    return list(range(block_start + step // 2, block_end, step))[:samples]
+
+
+def merge_blocks(blocks: list) -> list:
+    '''Joins adjacent (start, end) blocks into ranges.'''
+    ranges = []
+    for start, end in blocks:
+        if ranges and ranges[-1].stop == start:
+            ranges[-1] = range(ranges[-1].start, end)
+        else:
+            ranges.append(range(start, end))
+    return ranges
+
+
+async def probe_live_ranges(fetch, start: int, end: int, index: IdIndex, is_valid, block_size: int = 1000, samples: int = 10,
+                            threads: int = 20, recheck_days: float = 7.0) -> tuple:
+    """
+    Finds the live parts of an ID range before a full sweep by sampling each block of IDs.
+
+    A block with a known valid ID (from earlier probes or sweeps) is live without any request. Other blocks have
+    `samples` evenly spaced IDs checked, reusing checks newer than recheck_days, and are skipped when none is valid.
+    With the default 10 samples per 1000 IDs, a dead region costs 1% of the requests a full sweep of it would.
+
+    Args:
+        fetch: coroutine function taking one ID, ex. a process_player/process_event partial
+        start (int): first ID of the range
+        end (int): end of the range (exclusive)
+        index (IdIndex): known IDs, updated with every sample checked
+        is_valid: function telling whether a fetch result is a real page (see player_exists/event_exists)
+        block_size (int): IDs per block, the granularity dead regions are skipped at
+        samples (int): IDs sampled per block without known valid IDs
+        threads (int): maximum amount of samples fetched at once
+        recheck_days (float): age after which a dead sample is fetched again
+
+    Returns:
+        tuple: ranges of IDs to sweep, in ID order, and {id: result} of the samples fetched inside them, to be passed
+            on to the sweep (see with_samples) instead of fetched again.
+    """
+    since = time.time() - recheck_days * 86400
+    blocks = [(block_start, min(block_start + block_size, end)) for block_start in range(start, end, block_size)]
+    live, to_sample = set(), {}
+    for block in blocks:
+        if index.has_valid(*block):
+            live.add(block)
+            continue
+        checked = index.checked_since(*block, since)
+        unchecked = [item_id for item_id in block_samples(*block, samples) if item_id not in checked]
+        if unchecked:
+            to_sample[block] = unchecked
+
+    sample_ids = [item_id for unchecked in to_sample.values() for item_id in unchecked]
+    logger.info(f"Probing {len(sample_ids)} sample IDs across {len(to_sample)} of {len(blocks)} blocks ({len(live)} blocks already known live)")
+    block_of = {item_id: block for block, unchecked in to_sample.items() for item_id in unchecked}
+    valid_samples, fetched = 0, {}
+    async for item_id, result in index.track(stream_results(fetch, sample_ids, threads), is_valid):
+        valid = result is not None and is_valid(result)
+        valid_samples += valid
+        if result is None or valid: #a failed sample can't rule its block out
+            live.add(block_of[item_id])
+        if result is not None:
+            fetched[item_id] = result
+
+    sampled = {item_id: result for item_id, result in fetched.items() if block_of[item_id] in live} #failed samples are swept again
+    ranges = merge_blocks(sorted(live))
+    live_ids = sum(len(id_range) for id_range in ranges)
+    density = f" - {valid_samples / len(sample_ids):.0%} of samples valid" if sample_ids else ''
+    logger.info(f"{len(live)} of {len(blocks)} blocks live{density} - sweeping {live_ids} of {end - start} IDs in {len(ranges)} ranges")
+    return ranges, sampled
+
+
+async def with_samples(sampled: dict, results):
+    '''Yields the (id, result) pairs a probe already fetched, then the sweep's, so sampled IDs are written without a second request.'''
+    for item_id, result in sampled.items():
+        yield item_id, result
+    async for item_id, result in results:
+        yield item_id, result
@@ -1,56 +1,84 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+try: #selenium is only needed for the browser engine, the HTTP engine below runs without it
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+except ImportError:
+    By = WebDriverWait = EC = None
 from bs4 import BeautifulSoup
+import asyncio
 import csv
+import re
 import pandas as pd
 import time
+import httpx
+from collections import namedtuple
+from pg_scraper_utils.Parser_utils import parse_page, run_parse
+from pg_scraper_utils.Throttle_utils import fetch_with_retry
+from pg_scraper_utils.Metrics_utils import logger, maybe_stage
+from pg_scraper_utils.Event_utils import player_link_pattern
 
-ranking_fieldnames = ['NatPGRank', 'PlayerName', 'Position', 'BT', 'Height', 'Weight', 'Hometown', 'TournamentTeam', 'HS', 'Commit', 'Report']
+ranking_fieldnames = ['NatPGRank', 'PlayerName', 'PlayerID', 'Position', 'BT', 'Height', 'Weight', 'Hometown', 'TournamentTeam', 'HS', 'Commit', 'Report']
 
-def parse_player_row(player_row, report_row) -> dict:
+rankings_table_id = 'ContentTopLevel_ContentPlaceHolder1_gvPlayers'
+
+rankings_url = '/Rankings/Players/NationalRankings.aspx?gyear={year}'
+
+postback_fields = ['__EVENTTARGET', '__EVENTARGUMENT', '__LASTFOCUS', '__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']
+
+#pager links look like javascript:__doPostBack('ctl00$...$gvPlayers','Page$11'), quotes usually html-escaped
+pager_pattern = re.compile(r"__doPostBack\((?:&#39;|')([^'&]+)(?:&#39;|'),\s*(?:&#39;|')Page\$(\d+)(?:&#39;|')\)")
 
+RankingsPage = namedtuple('RankingsPage', ['number', 'players', 'form', 'pager'])  # parsed page: players, postback form state and page number -> event target
+
+ranking_fields = {
+    'NatPGRank': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblNatRank_'),
+    'PlayerName': ('a', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_hlPlayerName_'),
+    'BT': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblBatsThrows_'),
+    'Height': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblHeight_'),
+    'Weight': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblWeight_'),
+    'Hometown': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblHometown_'),
+    'TournamentTeam': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblTravelTeam_'),
+    'HS': ('a', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_hl2yr_'),
+    'Commit': ('a', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_hl4yr_'),
+}
+
+def find_by_prefix(row, tag, id_start):
+    #rows only index the handful of ids inside them, so a prefix scan is cheap
+    return next((node for element_id, node in row.ids.items() if node.tag == tag and element_id.startswith(id_start)), None)
+
+def parse_player_row(player_row, report_row) -> dict:
 
     player_data = {}
-    fields = {
-        'NatPGRank': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblNatRank_'),
-        'PlayerName': ('a', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_hlPlayerName_'),
-        'BT': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblBatsThrows_'),
-        'Height': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblHeight_'),
-        'Weight': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblWeight_'),
-        'Hometown': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblHometown_'),
-        'TournamentTeam': ('span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_lblTravelTeam_'),
-        'HS': ('a', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_hl2yr_'),
-        'Commit': ('a', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_hl4yr_'),
-    }
     
-    for field, (tag, id_start) in fields.items():
-        element = player_row.find(tag, {'id': lambda x: x and x.startswith(id_start)})
+    for field, (tag, id_start) in ranking_fields.items():
+        element = find_by_prefix(player_row, tag, id_start)
         player_data[field] = element.text.strip() if element else 'N/A'
+
+    #name links to ../../Players/PlayerProfile.aspx?ID=<PlayerID>, so rankings join to profiles by ID rather than by name
+    name_link = find_by_prefix(player_row, *ranking_fields['PlayerName'])
+    link_match = player_link_pattern.search(name_link.attrs.get('href', '')) if name_link else None
+    player_data['PlayerID'] = int(link_match.group(1)) if link_match else None
     
-    pos_cell = player_row.find_all('td')[2] #specific position field not in HTML, needs to be manually specified
-    player_data['Position'] = pos_cell.text.strip() if pos_cell else 'N/A'
+    #specific position field not in HTML, needs to be manually specified
+    player_data['Position'] = player_row.cells[2].strip() if len(player_row.cells) > 2 else 'N/A'
     
     if report_row: #not all players have comments
-        report_element = report_row.find('span', {'id': lambda x: x and x.startswith('ContentTopLevel_ContentPlaceHolder1_gvPlayers_InternalCommentLiteral_')}) 
+        report_element = find_by_prefix(report_row, 'span', 'ContentTopLevel_ContentPlaceHolder1_gvPlayers_InternalCommentLiteral_')
         player_data['Report'] = report_element.text.strip() if report_element else 'N/A'
     else:
         player_data['Report'] = 'N/A'
     
     return player_data
 
-def scrape_rankings_page(driver) -> list:
+def rankings_players(page) -> list:
 
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    
-    table = soup.find('table', {'id': 'ContentTopLevel_ContentPlaceHolder1_gvPlayers'})
-    if not table:
-        print("No rankings table found on the page")
+    table = page.find_table(table_id=rankings_table_id)
+    if table is None:
+        logger.warning("No rankings table found on the page")
         return []
 
     players_data = []
-    rows = table.find_all('tr')[1:]
+    rows = page.table_rows(table)[1:]
     
     for i in range(0, len(rows), 2):  # processes rows consistent with table structure
         player_row = rows[i]
@@ -61,6 +89,82 @@ def scrape_rankings_page(driver) -> list:
 
     return players_data
 
+def parse_rankings_html(html, engine=None) -> list:
+
+    return rankings_players(parse_page(html, engine))
+
+def postback_form(page) -> dict:
+    #hidden ASP.NET fields that have to be posted back for the server to accept a paging event
+    form = {}
+    for field in postback_fields:
+        node = page.node(field)
+        if node is not None:
+            form[field] = node.attrs.get('value', '')
+    return form
+
+def pager_pages(html) -> dict:
+    #page numbers linked from the pager (including the ellipsis to the next window) -> postback event target
+    return {int(number): target for target, number in pager_pattern.findall(html)}
+
+def parse_rankings_response(html, number, engine=None) -> RankingsPage:
+
+    page = parse_page(html, engine)
+    return RankingsPage(number, rankings_players(page), postback_form(page), pager_pages(html))
+
+async def fetch_rankings_page(client: httpx.AsyncClient, url: str, retries: int, number: int = 1, state: RankingsPage = None,
+                              limiter=None, parse_pool=None, engine=None, metrics=None) -> RankingsPage:
+
+    form = None
+    if state is not None: #replays the pager link click from the posted page's form state
+        form = dict(state.form, __EVENTTARGET=state.pager[number], __EVENTARGUMENT=f'Page${number}')
+    response = await fetch_with_retry(client, url, retries, limiter, data=form, metrics=metrics)
+    response.raise_for_status()
+    with maybe_stage(metrics, 'parse'):
+        return await run_parse(parse_pool, parse_rankings_response, response.text, number, engine)
+
+async def stream_rankings_pages(client: httpx.AsyncClient, year: int, max_pages: int, retries: int, limiter=None, parse_pool=None, engine=None,
+                                metrics=None):
+    """
+    Pages through a year's national rankings over plain HTTP by replaying the grid's ASP.NET postbacks.
+
+    The first page is a GET, every other page a POST carrying the __VIEWSTATE/__EVENTVALIDATION of a page whose
+    pager links to it. Event validation accepts any page linked from the posted state, so the whole pager window
+    (ex. pages 2-11 from page 1) is fetched concurrently from one state, then the last page of the window (the
+    ellipsis target) becomes the state for the next window.
+
+    Args:
+        client (httpx.AsyncClient): shared client
+        year (int): graduation year of the rankings
+        max_pages (int): pages to fetch (100 players per page)
+        retries (int): total attempts allowed per page
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller
+        parse_pool (ParsePool, optional): process pool pages are parsed in
+        engine (str, optional): parser engine
+        metrics (ScrapeMetrics, optional): run metrics, given the fetch and parse time of every page
+
+    Yields:
+        RankingsPage: pages in page order, stopping early when the pager has no further pages or a page is empty.
+    """
+    url = rankings_url.format(year=year)
+    state = await fetch_rankings_page(client, url, retries, limiter=limiter, parse_pool=parse_pool, engine=engine, metrics=metrics)
+    yield state
+
+    fetched = 1
+    while fetched < max_pages and state.players:
+        window = sorted(number for number in state.pager if fetched < number <= max_pages)
+        if not window or window[0] != fetched + 1:
+            break
+        pages = await asyncio.gather(*(fetch_rankings_page(client, url, retries, number, state, limiter, parse_pool, engine, metrics) for number in window))
+        for page in pages:
+            yield page
+            if not page.players:
+                return
+        fetched, state = window[-1], pages[-1]
+
+def scrape_rankings_page(driver, engine=None) -> list:
+
+    return parse_rankings_html(driver.page_source, engine)
+
 def navigate_to_next_page(driver, current_page) -> bool:
 
     try:
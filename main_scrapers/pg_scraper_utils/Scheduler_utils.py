@@ -0,0 +1,39 @@
+import asyncio
+
+
+async def stream_results(func, ids, limit: int):
+    """
+    Runs func over ids with at most `limit` calls in flight, yielding (id, result) pairs as each call finishes.
+
+    IDs are pulled lazily from the iterable and a new call is only started once a finished result has been handed
+    to the consumer, so memory stays flat no matter how wide the ID range is and a slow consumer (ex. a disk writer)
+    naturally slows the fetchers down. Pending calls are cancelled if the consumer stops iterating early.
+
+    Args:
+        func: coroutine function taking a single ID
+        ids: any iterable of IDs (ex. a range), consumed lazily
+        limit (int): maximum amount of calls running at once
+
+    Yields:
+        tuple: (id, result) in completion order, not ID order.
+    """
+    ids = iter(ids)
+    pending = {}
+
+    def fill():
+        while len(pending) < limit:
+            item = next(ids, StopIteration)
+            if item is StopIteration:
+                return
+            pending[asyncio.ensure_future(func(item))] = item
+
+    try:
+        fill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task.result()
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
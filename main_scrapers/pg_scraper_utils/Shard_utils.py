@@ -0,0 +1,136 @@
+import os
+import socket
+import sqlite3
+import time
+import pandas as pd
+from pg_scraper_utils.Output_utils import open_sink, Checkpoint, checkpoint_name
+from pg_scraper_utils.Delta_utils import read_output
+from pg_scraper_utils.Metrics_utils import logger
+
+#sweep kind -> store table its rows go to, and the ID column merged shards are sorted by
+shard_tables = {'players': 'players', 'events': 'events'}
+shard_keys = {'players': 'PlayerID', 'events': 'EventID'}
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def shard_filename(shard_dir: str, kind: str, start: int, end: int, output_format: str) -> str:
+    return os.path.join(shard_dir, f'{kind}_{start}-{end}.{output_format}')
+
+
+def shard_complete(filename: str, output_format: str, kind: str, start: int, end: int) -> bool:
+    '''Whether every ID of the shard is done or empty in its checkpoint, failed IDs make it incomplete.'''
+    checkpoint = Checkpoint(checkpoint_name(filename, output_format, shard_tables[kind]))
+    return next(checkpoint.pending(range(start, end)), None) is None
+
+
+class ShardLeases:
+    """
+    Lease table splitting an ID sweep into shards that any number of workers take turns on, kept in an SQLite file.
+    Workers can be local processes or other machines that open the same file, ex. on a shared drive. No broker is
+    involved, the file's locking is the only coordination.
+
+    A worker leases the first pending shard for `lease_seconds` and renews the lease while it works. A shard whose
+    lease expired (its worker crashed or lost the drive) or that finished with failed IDs goes back to pending, up
+    to `max_attempts` leases, after which it is marked failed and left out.
+
+    Args:
+        filename (str): lease file, created if it doesn't exist (ex. '/mnt/shared/pg_players.leases')
+        max_attempts (int): leases a shard gets before it is given up on
+    """
+
+    def __init__(self, filename: str, max_attempts: int = 5):
+        self.filename = filename
+        self.max_attempts = max_attempts
+        #default rollback journal, WAL needs shared memory that network drives don't provide
+        self.db = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS shards (
+                               kind TEXT NOT NULL, id_start INTEGER NOT NULL, id_end INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending',
+                               worker TEXT, expires REAL, attempts INTEGER NOT NULL DEFAULT 0, output TEXT, PRIMARY KEY (kind, id_start))''')
+
+    def plan(self, kind: str, start: int, end: int, shard_size: int) -> int:
+        '''Splits [start, end) into shards of shard_size IDs. Shards planned by an earlier run keep their progress.'''
+        self.db.executemany('INSERT OR IGNORE INTO shards (kind, id_start, id_end) VALUES (?, ?, ?)',
+                            [(kind, shard_start, min(shard_start + shard_size, end)) for shard_start in range(start, end, shard_size)])
+        return self.db.execute('SELECT COUNT(*) FROM shards WHERE kind = ?', (kind,)).fetchone()[0]
+
+    def lease(self, kind: str, worker: str, lease_seconds: float = 600) -> tuple:
+        '''Takes the first pending (or expired) shard for the worker, returning (start, end) or None when none is free.'''
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE') #one worker at a time between the select and the update
+        try:
+            self.db.execute("UPDATE shards SET status = 'failed' WHERE kind = ? AND status != 'done' AND attempts >= ? AND (status = 'pending' OR expires < ?)",
+                            (kind, self.max_attempts, now))
+            shard = self.db.execute("SELECT id_start, id_end FROM shards WHERE kind = ? AND (status = 'pending' OR (status = 'leased' AND expires < ?)) "
+                                    "ORDER BY id_start LIMIT 1", (kind, now)).fetchone()
+            if shard is not None:
+                self.db.execute("UPDATE shards SET status = 'leased', worker = ?, expires = ?, attempts = attempts + 1 WHERE kind = ? AND id_start = ?",
+                                (worker, now + lease_seconds, kind, shard[0]))
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return shard
+
+    def renew(self, kind: str, start: int, worker: str, lease_seconds: float = 600) -> bool:
+        '''Extends the worker's lease, False if the shard was re-leased to someone else meanwhile.'''
+        cursor = self.db.execute("UPDATE shards SET expires = ? WHERE kind = ? AND id_start = ? AND worker = ? AND status = 'leased'",
+                                 (time.time() + lease_seconds, kind, start, worker))
+        return cursor.rowcount > 0
+
+    def complete(self, kind: str, start: int, worker: str, output: str) -> None:
+        self.db.execute("UPDATE shards SET status = 'done', output = ?, expires = NULL WHERE kind = ? AND id_start = ? AND worker = ?",
+                        (output, kind, start, worker))
+
+    def release(self, kind: str, start: int, worker: str) -> None:
+        '''Hands an unfinished shard back, to be leased again (its checkpoint keeps the IDs already done).'''
+        self.db.execute("UPDATE shards SET status = 'pending', worker = NULL, expires = NULL WHERE kind = ? AND id_start = ? AND worker = ?",
+                        (kind, start, worker))
+
+    def active(self, kind: str) -> int:
+        '''Shards other workers hold unexpired leases on, which may still come back as pending.'''
+        return self.db.execute("SELECT COUNT(*) FROM shards WHERE kind = ? AND status = 'leased' AND expires >= ?", (kind, time.time())).fetchone()[0]
+
+    def counts(self, kind: str) -> dict:
+        return dict(self.db.execute('SELECT status, COUNT(*) FROM shards WHERE kind = ? GROUP BY status', (kind,)).fetchall())
+
+    def shards(self, kind: str) -> list:
+        '''(start, end, status, output) of every shard, in ID order.'''
+        return self.db.execute('SELECT id_start, id_end, status, output FROM shards WHERE kind = ? ORDER BY id_start', (kind,)).fetchall()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def merge_shards(leases: ShardLeases, kind: str, output_filename: str, output_format: str = 'csv', shard_dir: str = None) -> int:
+    """
+    Combines every shard's output into one dataset, in ID order, one shard in memory at a time. Failed shards are
+    merged too, with whatever IDs they did finish.
+
+    Args:
+        leases (ShardLeases): lease table of the sweep
+        kind (str): 'players' or 'events'
+        output_filename (str): merged dataset, replaced if it exists ('sqlite' rows are upserted into its table)
+        output_format (str): format of the shards and the merged dataset
+        shard_dir (str, optional): directory the shard outputs are in, used for shards without a recorded output
+
+    Returns:
+        int: rows in the merged dataset.
+    """
+    sink = open_sink(output_filename, output_format, table=shard_tables[kind])
+    try:
+        for start, end, status, output in leases.shards(kind):
+            output = output or (shard_filename(shard_dir, kind, start, end, output_format) if shard_dir else None)
+            if output is None or not os.path.exists(output):
+                continue
+            if status != 'done':
+                logger.warning(f"Shard {start}-{end} is {status}, merging the IDs it finished")
+            df = read_output(output, output_format, shard_tables[kind])
+            if shard_keys[kind] in df.columns: #rows were written in completion order
+                df = df.iloc[pd.to_numeric(df[shard_keys[kind]], errors='coerce').argsort(kind='stable')]
+            sink.write(df)
+    finally:
+        sink.close()
+    return sink.rows_written
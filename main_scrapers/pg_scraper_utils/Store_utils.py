@@ -0,0 +1,209 @@
+import sqlite3
+import pandas as pd
+from pg_scraper_utils.Directory_utils import PlayerDirectory
+
+#key columns and lookup indexes of each table, other columns are added as they first show up in a batch
+store_tables = {
+    'players': {'key': ['PlayerID'], 'indexes': ['PlayerName', 'HSGrad', 'Position', 'Age']},
+    'events': {'key': ['EventID', 'Row'], 'indexes': ['Name', 'PlayerID', 'ShowcaseDate']},
+    'rankings': {'key': ['Year', 'NatPGRank', 'PlayerName'], 'indexes': ['PlayerName', 'PlayerID']},
+    'name_matches': {'key': ['Query', 'QueryGradYear', 'QueryPosition'], 'indexes': ['PlayerID']},
+}
+
+
+def quote(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_type(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return 'TEXT'
+    if pd.api.types.is_integer_dtype(series):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(series):
+        return 'REAL'
+    return 'TEXT'
+
+
+def sql_values(series: pd.Series) -> list:
+    '''Column values as plain Python objects SQLite accepts, None for missing values.'''
+    missing = series.isna().tolist()
+    if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.astype('float64').tolist()
+        return [None if null else int(value) for value, null in zip(values, missing)]
+    if pd.api.types.is_float_dtype(series):
+        values = series.astype('float64').tolist()
+    else:
+        values = series.astype(object).tolist()
+        values = [value if isinstance(value, (str, int, float)) else str(value) for value in values]
+    return [None if null else value for value, null in zip(values, missing)]
+
+
+class PGStore:
+    """
+    Embedded SQLite database holding players, event workout rows and rankings across runs, so questions such as
+    "player X's workouts across events" are a query instead of a re-join of CSV files.
+
+    Tables are keyed by PlayerID (players), (EventID, Row) (events) and (Year, NatPGRank, PlayerName) (rankings), and
+    rows are upserted in one transaction per batch. Columns are added the first time a batch has them, typed from the
+    batch (INTEGER/REAL for typed numeric columns, TEXT otherwise), with indexes on the common lookup columns.
+
+    Args:
+        filename (str): database file, created if it doesn't exist (ex. 'pg.sqlite')
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.db = sqlite3.connect(filename)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.columns = {}
+        self.directory = None #fuzzy match index over the players table, rebuilt after players are upserted
+
+    def table_columns(self, table: str) -> list:
+        #only existing tables are cached, another connection (ex. a second year of rankings) may create it meanwhile
+        if not self.columns.get(table):
+            self.columns[table] = [row[1] for row in self.db.execute(f'PRAGMA table_info({quote(table)})')]
+        return self.columns[table]
+
+    def ensure_table(self, table: str, df: pd.DataFrame) -> None:
+        '''Creates the table or adds the batch's new columns, then any lookup index whose column now exists.'''
+        spec = store_tables[table]
+        existing = self.table_columns(table)
+        if not existing:
+            columns = spec['key'] + [col for col in df.columns if col not in spec['key']]
+            definitions = ', '.join(f'{quote(col)} {sql_type(df[col])}' for col in columns)
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {quote(table)} ({definitions}, PRIMARY KEY ({', '.join(map(quote, spec['key']))}))")
+            existing = self.table_columns(table)
+        for col in df.columns:
+            if col not in existing:
+                self.db.execute(f'ALTER TABLE {quote(table)} ADD COLUMN {quote(col)} {sql_type(df[col])}')
+                existing.append(col)
+        for col in spec['indexes']:
+            if col in existing:
+                self.db.execute(f'CREATE INDEX IF NOT EXISTS {quote(f"{table}_{col}")} ON {quote(table)} ({quote(col)})')
+
+    def upsert(self, table: str, df: pd.DataFrame) -> int:
+        """
+        Inserts a batch, replacing rows with the same key. For events, every earlier row of the events in the batch
+        is replaced, so an event whose table shrank doesn't keep stale rows.
+
+        Returns:
+            int: rows written.
+        """
+        if df.empty:
+            return 0
+        df = df.rename(columns=str)
+        if table == 'events' and 'Row' not in df.columns:
+            df = df.assign(Row=df.groupby('EventID').cumcount())
+        if table == 'players':
+            self.directory = None
+        with self.db: #one transaction per batch
+            self.ensure_table(table, df)
+            if table == 'events':
+                event_ids = sql_values(df['EventID'].drop_duplicates())
+                self.db.executemany('DELETE FROM events WHERE EventID = ?', [(event_id,) for event_id in event_ids])
+            columns = list(df.columns)
+            key = store_tables[table]['key']
+            updates = ', '.join(f'{quote(col)} = excluded.{quote(col)}' for col in columns if col not in key) or None
+            statement = (f"INSERT INTO {quote(table)} ({', '.join(map(quote, columns))}) VALUES ({', '.join('?' * len(columns))}) "
+                         f"ON CONFLICT ({', '.join(map(quote, key))}) DO " + (f'UPDATE SET {updates}' if updates else 'NOTHING'))
+            self.db.executemany(statement, zip(*(sql_values(df[col]) for col in columns)))
+        return len(df)
+
+    def delete(self, table: str, **values) -> None:
+        '''Deletes the rows matching every given column value, ex. delete('rankings', Year=2024).'''
+        if not self.table_columns(table):
+            return
+        conditions = ' AND '.join(f'{quote(col)} = ?' for col in values)
+        with self.db:
+            self.db.execute(f'DELETE FROM {quote(table)} WHERE {conditions}', list(values.values()))
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """
+        Runs a read query and returns the result as a DataFrame.
+
+        Usage:
+            store.query('SELECT e.* FROM events e WHERE e.Name = ? ORDER BY e.ShowcaseDate', ['Jordan Example'])
+        """
+        return pd.read_sql_query(sql, self.db, params=params)
+
+    def search(self, name: str = None, age=None, position=None, graduation_year=None, limit: int = None) -> list:
+        """
+        Looks players up in the players table by any combination of name and filters, the same way
+        Directory_utils.PlayerDirectory.search does over the player ID file.
+
+        Args:
+            name (str, optional): full or partial player name, every word has to appear in the name
+            age (int, optional): age rounded down to the year (ex. 18)
+            position (str, optional): a single position (ex. C, 1B, RHP), matches any combo containing it
+            graduation_year (int, optional): full year of graduation (ex. 2024)
+            limit (int, optional): maximum amount of matches returned
+
+        Returns:
+            list: dicts of PlayerName and PlayerID for matching players, in PlayerID order.
+        """
+        if not self.table_columns('players'):
+            return []
+        conditions, params = [], []
+        for word in (name or '').split():
+            conditions.append('PlayerName LIKE ?')
+            params.append(f'%{word}%')
+        if age is not None:
+            conditions.append('CAST(Age AS INTEGER) = ?')
+            params.append(int(float(age)))
+        if position is not None: #position combos are written "RHP/SS" or "C, 1B"
+            conditions.append("('/' || REPLACE(REPLACE(UPPER(Position), ', ', '/'), ',', '/') || '/') LIKE ?")
+            params.append(f'%/{str(position).strip().upper()}/%')
+        if graduation_year is not None:
+            conditions.append('CAST(HSGrad AS INTEGER) = ?')
+            params.append(int(float(graduation_year)))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f'SELECT PlayerName, PlayerID FROM players {where} ORDER BY PlayerID' + (' LIMIT ?' if limit is not None else '')
+        rows = self.db.execute(sql, params + ([limit] if limit is not None else [])).fetchall()
+        return [{'PlayerName': player_name, 'PlayerID': player_id} for player_name, player_id in rows]
+
+    def match(self, name: str, graduation_year=None, position=None, limit: int = 5, min_confidence: float = 0.5) -> list:
+        '''Fuzzy name lookup with ranked candidates over the players table, see Directory_utils.PlayerDirectory.match.'''
+        if self.directory is None:
+            if not self.table_columns('players'):
+                return []
+            columns = [col for col in ['PlayerID', 'PlayerName', 'Age', 'Position', 'HSGrad'] if col in self.table_columns('players')]
+            self.directory = PlayerDirectory(self.query(f"SELECT {', '.join(map(quote, columns))} FROM players ORDER BY PlayerID"))
+        return self.directory.match(name, graduation_year, position, limit, min_confidence)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class StoreSink:
+    """
+    Output sink upserting batches into a PGStore table, registered as the 'sqlite' output format.
+
+    Args:
+        filename (str): database file (see PGStore)
+        append (bool): keeps earlier rows matching `fixed`. Rows of other runs are always kept, the store accumulates.
+        table (str): 'players', 'events' or 'rankings'
+        fixed (dict, optional): values added to every row, ex. {'Year': 2024} for a year of rankings. Without append,
+            earlier rows with these values are cleared first, so a re-scraped year doesn't keep stale ranks.
+    """
+
+    def __init__(self, filename: str, append: bool = False, table: str = 'players', fixed: dict = None):
+        if table not in store_tables:
+            raise ValueError(f"Unknown table '{table}' - choose from {list(store_tables)}")
+        self.store = PGStore(filename)
+        self.table = table
+        self.fixed = fixed or {}
+        if self.fixed and not append:
+            self.store.delete(table, **self.fixed)
+        self.rows_written = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        if self.fixed:
+            df = df.assign(**self.fixed)
+        self.rows_written += self.store.upsert(self.table, df)
+
+    def close(self) -> None:
+        self.store.close()
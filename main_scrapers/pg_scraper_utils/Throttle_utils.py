@@ -0,0 +1,183 @@
+import asyncio
+import random
+import time
+import httpx
+from contextlib import asynccontextmanager, nullcontext
+from email.utils import parsedate_to_datetime
+from pg_scraper_utils.Metrics_utils import maybe_stage
+
+retry_statuses = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Caps the request rate: each request takes one token, tokens refill at `rate` per second up to `burst`.
+
+    Args:
+        rate (float): sustained requests per second
+        burst (int, optional): tokens that can be spent at once after an idle period. Defaults to one second of rate.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:  # requests queue up in order instead of all polling at once
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency controller shared by every request of a scrape run, with an optional requests-per-second cap.
+
+    The concurrency limit grows by `increase` for every `limit` successful requests (about one step per round of
+    requests) and is multiplied by `decrease` when the site throttles (429/5xx or a transport error), at most once
+    per `cooldown` seconds so one burst of errors only counts once. A Retry-After header pauses every request
+    until it has passed. The limit settles at the highest level the site handles without throttling.
+
+    Args:
+        initial (int): starting concurrency limit
+        minimum (int): lowest the limit can drop to
+        maximum (int): highest the limit can grow to
+        increase (float): additive step per round of successful requests
+        decrease (float): multiplicative factor applied when throttled
+        rate (float, optional): requests per second cap (see TokenBucket). None leaves the rate uncapped.
+        cooldown (float): seconds after a decrease during which further throttling does not decrease again
+    """
+
+    def __init__(self, initial: int = 5, minimum: int = 1, maximum: int = 50, increase: float = 1.0, decrease: float = 0.5,
+                 rate: float = None, cooldown: float = 2.0):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(rate) if rate else None
+        self.active = 0
+        self.resume_at = 0.0
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        '''Waits for a free concurrency slot (and a rate token) before a request and frees it afterwards.'''
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+        try:
+            pause = self.resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            yield
+        finally:
+            async with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def on_throttle(self, retry_after: float = None) -> None:
+        now = time.monotonic()
+        if retry_after:
+            self.resume_at = max(self.resume_at, now + retry_after)
+        if now - self.last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.last_decrease = now
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    '''Exponential backoff with full jitter: a random delay between 0 and base * 2^attempt seconds, capped.'''
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(response: httpx.Response) -> float:
+    '''Reads a Retry-After header given in seconds or as an HTTP date, None when absent or unreadable.'''
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_with_retry(client: httpx.AsyncClient, url: str, retries: int, limiter: AdaptiveLimiter = None, headers: dict = None,
+                           data: dict = None, metrics=None) -> httpx.Response:
+    """
+    GETs (or POSTs form data to) a page through the shared limiter, retrying throttled (429/5xx) and failed requests with backoff.
+
+    Args:
+        client (httpx.AsyncClient): shared client
+        url (str): page being fetched
+        retries (int): total attempts allowed
+        limiter (AdaptiveLimiter, optional): shared concurrency/rate controller
+        headers (dict, optional): extra request headers, ex. conditional request validators
+        data (dict, optional): form fields, sent as a POST (ex. an ASP.NET postback) instead of a GET
+        metrics (ScrapeMetrics, optional): run metrics, given the queue_wait and fetch time of every attempt, its status and retries
+
+    Returns:
+        httpx.Response: the first response that was not throttled (304 and 4xx other than 429 are returned as is).
+
+    Raises:
+        httpx.HTTPStatusError: every attempt was throttled.
+        httpx.TransportError: the last attempt failed to connect or timed out.
+        ValueError: retries is below 1, no request would be made.
+    """
+    if retries < 1:
+        raise ValueError(f"retries is the total attempts allowed and has to be at least 1, got {retries}")
+    for attempt in range(retries):
+        last_attempt = attempt == retries - 1
+        queued = time.perf_counter()
+        try:
+            async with limiter.slot() if limiter else nullcontext():
+                if metrics is not None:
+                    metrics.observe('queue_wait', time.perf_counter() - queued)
+                with maybe_stage(metrics, 'fetch'):
+                    if data is None:
+                        response = await client.get(url, headers=headers)
+                    else:
+                        response = await client.post(url, headers=headers, data=data)
+        except httpx.TransportError as e:
+            if limiter:
+                limiter.on_throttle()
+            if last_attempt:
+                raise
+            if metrics is not None:
+                metrics.retry(type(e).__name__)
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        if metrics is not None:
+            metrics.response(response.status_code)
+        if response.status_code not in retry_statuses:
+            if limiter:
+                limiter.on_success()
+            return response
+
+        retry_after = retry_after_seconds(response)
+        if limiter:
+            limiter.on_throttle(retry_after)
+        if last_attempt:
+            response.raise_for_status()
+        if metrics is not None:
+            metrics.retry(response.status_code)
+        await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
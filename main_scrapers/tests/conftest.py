@@ -0,0 +1,7 @@
+import os
+import sys
+
+#tests import the utilities the way the scrapers do, from the main_scrapers directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
@@ -0,0 +1,31 @@
+import pandas as pd
+from pg_scraper_utils.Directory_utils import PlayerDirectory
+
+
+def directory():
+    return PlayerDirectory(pd.DataFrame([
+        {'PlayerID': 1, 'PlayerName': 'Luke Jackson', 'Age': 17, 'Position': 'RHP/SS', 'HSGrad': 2025},
+        {'PlayerID': 2, 'PlayerName': 'Sonny Gray', 'Age': 18, 'Position': 'C', 'HSGrad': 2024},
+        {'PlayerID': 3, 'PlayerName': "José O'Neil", 'Age': 18, 'Position': 'OF', 'HSGrad': 2024},
+    ]))
+
+
+def ids(matches):
+    return [match['PlayerID'] for match in matches]
+
+
+def test_mid_word_query_matches_like_a_substring_lookup():
+    #"son" starts "Sonny" and sits inside "Jackson"
+    assert ids(directory().search(name='son')) == [1, 2]
+    assert ids(directory().search(name='kso')) == [1]
+
+
+def test_word_prefixes_match_in_any_order():
+    assert ids(directory().search(name='jack lu')) == [1]
+    assert ids(directory().search(name='oneil jose')) == [3]
+
+
+def test_filters_combine_with_names():
+    assert ids(directory().search(name='son', graduation_year=2024)) == [2]
+    assert ids(directory().search(position='SS')) == [1]
+    assert ids(directory().search(age=18, position='OF')) == [3]
@@ -0,0 +1,37 @@
+import os
+import pytest
+from conftest import FIXTURE_DIR
+from pg_scraper_utils.Event_utils import has_workout_table, parse_event_page, extract_workout_table
+from pg_scraper_utils.Parser_utils import available_engines, parse_page
+
+BENCH_FIXTURE_DIR = os.path.join(os.path.dirname(FIXTURE_DIR), '..', 'benchmarks', 'fixtures')
+
+
+def read(directory, name):
+    with open(os.path.join(directory, name), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('engine', available_engines())
+def test_results_table_found_past_empty_and_layout_tables(engine):
+    html = read(FIXTURE_DIR, 'workout_results_layout.html')
+    assert has_workout_table(html)
+    df = parse_event_page(html, engine)
+    assert df['PlayerID'].tolist() == [300001, 300002]
+    assert df['Name'].tolist() == ['Mason Reed', 'Owen Hart']
+    assert df['ShowcaseTitle'].iloc[0] == '2023 Winter Prospect Showcase'
+
+
+@pytest.mark.parametrize('engine', available_engines())
+def test_layout_tables_alone_are_not_results(engine):
+    html = read(BENCH_FIXTURE_DIR, 'workout_results_empty.html')
+    assert not has_workout_table(html)
+    assert parse_event_page(html, engine).empty
+    #the extractor agrees with the short-circuit, the layout rows are not read as workout rows
+    assert extract_workout_table(parse_page(html, engine)) is None
+
+
+@pytest.mark.parametrize('engine', available_engines())
+def test_results_table_by_id(engine):
+    df = parse_event_page(read(BENCH_FIXTURE_DIR, 'workout_results.html'), engine)
+    assert len(df) > 0 and df['PlayerID'].notna().all()
@@ -0,0 +1,23 @@
+import pandas as pd
+from pg_scraper_utils.Normalize_utils import normalize_frame, normalize_events
+from pg_scraper_utils.Player_utils import clean_player_batch
+
+
+def test_undeclared_columns_stay_text_whatever_the_batch():
+    #the same value reads the same whether its batch happens to be all numeric or not
+    numeric_batch = normalize_frame(pd.DataFrame({'PlayerID': ['1'], 'Jersey': ['07']}))
+    mixed_batch = normalize_frame(pd.DataFrame({'PlayerID': ['2', '3'], 'Jersey': ['07', 'Dirtbags']}))
+    assert numeric_batch['Jersey'].tolist() == ['07']
+    assert mixed_batch['Jersey'].tolist() == ['07', 'Dirtbags']
+
+
+def test_declared_columns_are_typed():
+    df = normalize_events(pd.DataFrame({'EventID': ['9'], 'Ht': ['6-2'], 'FB': ['92 mph'], 'Pos': ['RHP'], 'Name': ['A']}))
+    assert df['EventID'].dtype == 'Int64' and df['Ht'].tolist() == [74.0] and df['FB'].tolist() == [92.0]
+    assert df['Name'].tolist() == ['A']
+
+
+def test_stats_categories_outside_the_schema_are_numeric():
+    df = clean_player_batch(pd.DataFrame({'PlayerID': [1], 'Spin Rate.Percentile': ['88%'], 'HS': ['007 Academy']}))
+    assert df['Spin Rate.Percentile'].tolist() == [88.0]
+    assert df['HS'].tolist() == ['7 Academy'] #text, with leading zeros stripped as clean_string does
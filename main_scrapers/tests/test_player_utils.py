@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+from pg_scraper_utils.Directory_utils import PlayerDirectory
+from pg_scraper_utils.Player_utils import name_query, resolve_player_names
+
+
+def directory():
+    return PlayerDirectory(pd.DataFrame([
+        {'PlayerID': 1, 'PlayerName': 'Luke Jackson', 'Age': 17, 'Position': 'RHP/SS', 'HSGrad': 2025},
+        {'PlayerID': 2, 'PlayerName': 'Sonny Gray', 'Age': 18, 'Position': 'C', 'HSGrad': 2024},
+    ]))
+
+
+def test_scalars_are_queries_without_a_name():
+    for item in (np.nan, None, pd.NA, 42):
+        assert name_query(item) == {'name': None, 'graduation_year': None, 'position': None}
+    assert name_query(('Sonny Gray', 2024)) == {'name': 'Sonny Gray', 'graduation_year': 2024, 'position': None}
+
+
+def test_blank_names_do_not_abort_the_batch():
+    #names read from a spreadsheet column, with a blank cell
+    names = pd.Series(['Luke Jackson', np.nan, ('Sonny Gray', 2024, 'C')], dtype=object)
+    resolved = resolve_player_names(names, directory())
+    assert [query['name'] for query, _ in resolved] == ['Luke Jackson', None, 'Sonny Gray']
+    assert [[match['PlayerID'] for match in matches][:1] for _, matches in resolved] == [[1], [], [2]]